@@ -1,5 +1,6 @@
 from flask import Flask
 from models import db
+from models.database import create_missing_columns, create_missing_indexes
 from routes import main_bp, courses_bp, registration_bp, upload_bp, auth_bp, sitemap_bp, generate_bp
 from routes.auth import init_oauth
 from flask_compress import Compress
@@ -7,12 +8,21 @@ from werkzeug.middleware.proxy_fix import ProxyFix
 import os
 
 app = Flask(__name__)
+
+# Use orjson for jsonify() when it's installed (much faster than stdlib json)
+try:
+    from utils.json_provider import OrjsonProvider
+    app.json = OrjsonProvider(app)
+except ImportError:
+    pass
+
 # Vercel sits behind a proxy, so we need to trust the headers (X-Forwarded-Proto, etc.)
 # x_proto=1 (HTTPS), x_host=1, x_port=1, x_prefix=1
 app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
 
-Compress(app)
 app.config.from_object('config')
+# Initialize compression after config is loaded so the COMPRESS_* settings apply
+Compress(app)
 
 # Initialize database
 db.init_app(app)
@@ -29,29 +39,74 @@ app.register_blueprint(upload_bp, url_prefix='/api/upload')
 app.register_blueprint(generate_bp, url_prefix='/api/generate')
 app.register_blueprint(sitemap_bp)
 
-# Create tables
+# Create tables. Columns and indexes added to existing tables are applied by the
+# `sync-schema` command instead: inspecting and altering the schema on every
+# serverless cold start is slow, and concurrent starts race on the DDL.
 with app.app_context():
     db.create_all()
 
 from flask import request
+import hashlib
+
+# Static asset versioning: url_for('static', ...) appends ?v=<content hash> so
+# browsers/CDN can cache assets forever and still pick up changes on deploy.
+STATIC_MAX_AGE = 31536000  # 1 year
+# Paths that keep their default caching headers (checked against request.path, not the full URL)
+_CACHEABLE_PREFIXES = ('/static/', '/sitemap', '/robots.txt')
+_static_hashes = {}
+
+def _static_file_hash(filename):
+    """Short content hash for a static file (cached per process, except in debug)."""
+    if filename in _static_hashes and not app.debug:
+        return _static_hashes[filename]
+    try:
+        with open(os.path.join(app.static_folder, filename), 'rb') as f:
+            digest = hashlib.blake2b(f.read(), digest_size=4).hexdigest()
+    except OSError:
+        digest = None
+    _static_hashes[filename] = digest
+    return digest
+
+@app.url_defaults
+def add_static_version(endpoint, values):
+    """Append the content hash to static URLs."""
+    if endpoint == 'static' and 'v' not in values and values.get('filename'):
+        digest = _static_file_hash(values['filename'])
+        if digest:
+            values['v'] = digest
 
 @app.after_request
 def add_header(response):
     """Add headers to prevent caching for API/HTML, but allow for Static/Sitemaps."""
+    # Versioned static assets never change under the same URL
+    if request.endpoint == 'static' and request.args.get('v'):
+        response.headers['Cache-Control'] = f'public, max-age={STATIC_MAX_AGE}, immutable'
+        return response
+    
     # Allow caching for static files, sitemap, and robots.txt
-    if 'static' in request.url or 'sitemap' in request.url or 'robots.txt' in request.url:
+    if request.path.startswith(_CACHEABLE_PREFIXES):
         return response
+    
+    # JSON GETs: let the browser keep a copy but revalidate it every time via
+    # ETag, so unchanged data comes back as an empty 304 instead of the full body.
+    # (Flask-Compress suffixes the ETag per encoding and re-checks it after compressing.)
+    if request.method == 'GET' and response.status_code == 200 and response.is_json:
+        response.add_etag()
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response.make_conditional(request)
         
     response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
     response.headers['Pragma'] = 'no-cache'
     response.headers['Expires'] = '0'
     return response
 
-# Background Cleanup Task - ONLY for Guest data (preserves logged-in user data)
-import threading
-import time
+# Cleanup Task - ONLY for Guest data (preserves logged-in user data)
+# Runs on a schedule via /api/cron/cleanup (Vercel Cron, or any external cron)
+# or manually with `flask --app app cleanup`. There is deliberately no in-process
+# background thread: under multi-worker servers every worker would run its own sweep.
 from datetime import datetime, timedelta, timezone
 from models import Course
+from models.course import delete_courses_cascade
 
 import os
 
@@ -62,48 +117,45 @@ def _perform_cleanup_logic():
             # Define cutoff time (7 days ago)
             cutoff = datetime.now(timezone.utc) - timedelta(days=7)
             
-            deleted_count = 0
-            
             # ONLY delete old Guest courses (courses with guest_id set)
             # Logged-in user data (where user_id is set) is preserved forever
-            old_guest_courses = Course.query.filter(
-                Course.guest_id.isnot(None), 
+            old_course_ids = db.select(Course.id).where(
+                Course.guest_id.isnot(None),
                 Course.created_at < cutoff
-            ).all()
-            
-            if old_guest_courses:
-                print(f"[{datetime.now()}] Cleanup: Deleting {len(old_guest_courses)} old guest courses...")
-                for course in old_guest_courses:
-                    db.session.delete(course)
-                    deleted_count += 1
+            )
+            # Bulk DELETEs children -> parents instead of loading every course
+            # and letting the ORM cascade row by row.
+            deleted_count = delete_courses_cascade(old_course_ids)
             
             if deleted_count > 0:
                 db.session.commit()
                 print(f"[{datetime.now()}] Cleanup complete. Guest items deleted: {deleted_count}")
                 return deleted_count
             
+            db.session.rollback()
             return 0
     except Exception as e:
         print(f"Cleanup error: {e}")
         return -1
 
-def cleanup_orphaned_data():
-    """Background thread loop for local development."""
-    while True:
-        _perform_cleanup_logic()
-        # Run every hour (3600 seconds)
-        time.sleep(3600)
-
 @app.route('/api/cron/cleanup')
 def trigger_cleanup():
     """Endpoint for Serverless Cron Jobs - cleans GUEST data only."""
     count = _perform_cleanup_logic()
     return {'status': 'success', 'deleted_count': count}
 
-# Start cleanup thread ONLY if not on Vercel
-if not os.environ.get('VERCEL'):
-    cleanup_thread = threading.Thread(target=cleanup_orphaned_data, daemon=True)
-    cleanup_thread.start()
+@app.cli.command('cleanup')
+def cleanup_command():
+    """Delete guest data older than 7 days (same as the cron endpoint)."""
+    count = _perform_cleanup_logic()
+    print(f"Deleted {count} guest courses.")
+
+@app.cli.command('sync-schema')
+def sync_schema_command():
+    """Add model columns and indexes missing from existing tables (run after deploying model changes)."""
+    create_missing_columns()
+    create_missing_indexes()
+    print("Schema is up to date.")
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
@@ -5,7 +5,8 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 
 # Flask configuration
 SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-key-please-change-in-production'
-DEBUG = True
+# Debug is on for local development; off on Vercel unless FLASK_DEBUG says otherwise
+DEBUG = os.environ.get('FLASK_DEBUG', '0' if os.environ.get('VERCEL') else '1').lower() in ('1', 'true')
 
 # Database configuration
 # Database configuration
@@ -30,9 +31,32 @@ else:
 print(f"DEBUG: Using Database URI: {SQLALCHEMY_DATABASE_URI}")
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 SQLALCHEMY_ENGINE_OPTIONS = {
-    "pool_pre_ping": True,
-    "pool_recycle": 300,
+    # Pre-ping costs a round trip per checkout but guards against connections the
+    # serverless DB dropped while idle. Set DB_PREPING=0 on a stable network.
+    "pool_pre_ping": os.environ.get('DB_PREPING', '1') == '1',
+    "pool_recycle": int(os.environ.get('SQLALCHEMY_POOL_RECYCLE', 300)),
 }
+# Pool sizing only applies to server databases (keep within the provider's connection limit)
+if not SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
+    SQLALCHEMY_ENGINE_OPTIONS["pool_size"] = int(os.environ.get('SQLALCHEMY_POOL_SIZE', 5))
+    SQLALCHEMY_ENGINE_OPTIONS["max_overflow"] = int(os.environ.get('SQLALCHEMY_MAX_OVERFLOW', 10))
+
+# Response compression (Flask-Compress)
+# Brotli at a fast level for dynamic responses; small bodies aren't worth the CPU.
+# Static assets are compressed by the Vercel edge, not by this process.
+COMPRESS_ALGORITHM = ['br', 'gzip']
+COMPRESS_BR_LEVEL = 4
+COMPRESS_LEVEL = 6
+COMPRESS_MIN_SIZE = 2048
+
+# Timetable generation
+# Wall-clock budget (seconds) for building the /suggest candidate pool. Generation
+# runs inside the request (no worker queue on serverless), so cap it well under
+# the platform's function timeout; the best candidates found so far are ranked.
+GENERATION_TIME_BUDGET = float(os.environ.get('GENERATION_TIME_BUDGET', 6))
+# Worker processes for building the candidate pool. Keep 1 on serverless
+# (no multiprocessing there); raise it on multi-core servers (e.g. gunicorn on a VM).
+GENERATION_WORKERS = int(os.environ.get('GENERATION_WORKERS', 1))
 
 # Google OAuth Configuration
 GOOGLE_CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID', 'placeholder-client-id')
@@ -1,11 +1,16 @@
-from datetime import datetime
-from .database import db
+from sqlalchemy.orm import validates
+from .database import db, utcnow
 
 
 class Course(db.Model):
     """Course model representing a course in the curriculum."""
     
     __tablename__ = 'courses'
+    __table_args__ = (
+        # Scoped lookups by code (search, import de-dup) and guest cleanup sweeps
+        db.Index('ix_course_user_code', 'user_id', 'code'),
+        db.Index('ix_course_guest_created', 'guest_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     code = db.Column(db.String(20), nullable=False, index=True)
@@ -21,7 +26,9 @@ class Course(db.Model):
     # Ownership
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True, index=True)
     guest_id = db.Column(db.String(100), nullable=True, index=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Filled by the database (server_default); the Python default covers tables
+    # created before the server default existed, since create_all() never alters columns.
+    created_at = db.Column(db.DateTime(timezone=True), default=utcnow, server_default=db.func.now(), nullable=False)
     
     # Relationship to slots
     slots = db.relationship('Slot', backref='course', lazy='dynamic', cascade="all, delete-orphan")
@@ -29,17 +36,58 @@ class Course(db.Model):
     def __repr__(self):
         return f'<Course {self.code}: {self.name}>'
     
+    @validates('code')
+    def normalize_code(self, key, code):
+        """Course codes are stored upper-case so lookups/searches can match them case-sensitively."""
+        return code.strip().upper() if code else code
+    
     def to_dict(self):
+        return Course.row_to_dict((
+            self.id, self.code, self.name, self.l, self.t, self.p, self.j, self.c,
+            self.course_type, self.category
+        ))
+    
+    @classmethod
+    def dict_columns(cls):
+        """Columns read by row_to_dict(), for selecting rows without ORM objects."""
+        return (cls.id, cls.code, cls.name, cls.l, cls.t, cls.p, cls.j, cls.c,
+                cls.course_type, cls.category)
+    
+    @staticmethod
+    def row_to_dict(row):
+        """Serialize a row selected with dict_columns() (values in that column order)."""
+        # Unpacked positionally: Row.t is SQLAlchemy's tuple accessor, not the column
+        course_id, code, name, l, t, p, j, c, course_type, category = row
         return {
-            'id': str(self.id),
-            'code': self.code,
-            'name': self.name,
-            'l': self.l,
-            't': self.t,
-            'p': self.p,
-            'j': self.j,
-            'c': self.c,
-            'course_type': self.course_type,
-            'category': self.category,
-            'ltpjc': f'{self.l} {self.t} {self.p} {self.j} {self.c}'
+            'id': str(course_id),
+            'code': code,
+            'name': name,
+            'l': l,
+            't': t,
+            'p': p,
+            'j': j,
+            'c': c,
+            'course_type': course_type,
+            'category': category,
+            'ltpjc': f'{l} {t} {p} {j} {c}'
         }
+
+
+def delete_courses_cascade(course_ids):
+    """
+    Delete courses together with their slots and registrations using bulk DELETEs.
+    
+    `course_ids` may be a list of ids or a SELECT of course ids (e.g. an
+    ownership-scoped subquery). Children are removed explicitly because
+    SQLite does not enforce FK cascades.
+    
+    Returns:
+        Number of courses deleted
+    """
+    from .slot import Slot
+    from .registration import Registration
+    
+    slot_ids = db.select(Slot.id).where(Slot.course_id.in_(course_ids))
+    Registration.query.filter(Registration.slot_id.in_(slot_ids)).delete(synchronize_session=False)
+    Slot.query.filter(Slot.course_id.in_(course_ids)).delete(synchronize_session=False)
+    return Course.query.filter(Course.id.in_(course_ids)).delete(synchronize_session=False)
@@ -1,7 +1,13 @@
+from datetime import datetime, timezone
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.exc import SQLAlchemyError
 
 db = SQLAlchemy()
 
+def utcnow():
+    """Timezone-aware current UTC time (replacement for the deprecated datetime.utcnow)."""
+    return datetime.now(timezone.utc)
+
 def init_app(app):
     db.init_app(app)
     # Import models to register them with SQLAlchemy
@@ -10,3 +16,59 @@ def init_app(app):
     from .slot import Slot
     from .registration import Registration
     from .user import User
+
+
+def create_missing_columns():
+    """
+    Add nullable columns declared on models that are missing from existing tables.
+    Like indexes, new columns never reach a deployed database through
+    db.create_all(). Only nullable columns without a server default are added
+    automatically; anything else needs a hand-written migration.
+    Run via `flask --app app sync-schema`, not at import.
+    """
+    inspector = db.inspect(db.engine)
+    preparer = db.engine.dialect.identifier_preparer
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {col['name'] for col in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable or column.server_default is not None:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(db.text(
+                        f'ALTER TABLE {preparer.format_table(table)} '
+                        f'ADD COLUMN {preparer.format_column(column)} {column_type}'
+                    ))
+            except SQLAlchemyError:
+                # Another run added it in the meantime; anything else is a real error
+                added = {col['name'] for col in db.inspect(db.engine).get_columns(table.name)}
+                if column.name not in added:
+                    raise
+
+
+def create_missing_indexes():
+    """
+    Create indexes declared on models that are missing from existing tables.
+    db.create_all() skips tables that already exist, so new indexes would
+    otherwise never reach a deployed database.
+    Run via `flask --app app sync-schema`, not at import: building an index on a
+    large table can take a while.
+    """
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {ix['name'] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            try:
+                index.create(bind=db.engine, checkfirst=True)
+            except SQLAlchemyError:
+                # Another run created it in the meantime; anything else is a real error
+                created = {ix['name'] for ix in db.inspect(db.engine).get_indexes(table.name)}
+                if index.name not in created:
+                    raise
@@ -1,3 +1,5 @@
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from .database import db
 
 
@@ -7,7 +9,7 @@ class Faculty(db.Model):
     __tablename__ = 'faculties'
     
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
+    name = db.Column(db.String(100), nullable=False, unique=True)
     department = db.Column(db.String(50), nullable=True)
     
     # Relationship to slots
@@ -22,3 +24,55 @@ class Faculty(db.Model):
             'name': self.name,
             'department': self.department
         }
+
+
+# Dialect-specific INSERT constructs that support ON CONFLICT DO NOTHING
+_UPSERT_INSERTS = {
+    'sqlite': sqlite_insert,
+    'postgresql': pg_insert,
+    'cockroachdb': pg_insert,
+}
+
+
+def get_or_create_faculty_ids(names):
+    """
+    Resolve faculty names to ids, creating any that don't exist yet.
+
+    Issues one SELECT, plus one multi-row INSERT ... ON CONFLICT DO NOTHING
+    RETURNING for the missing names (instead of an INSERT + flush per name).
+
+    Returns:
+        dict mapping faculty name -> faculty id
+    """
+    names = set(names)
+    if not names:
+        return {}
+
+    rows = db.session.execute(
+        db.select(Faculty.name, Faculty.id).where(Faculty.name.in_(names))
+    ).all()
+    faculty_ids = {name: fid for name, fid in rows}
+
+    missing_names = names - faculty_ids.keys()
+    if not missing_names:
+        return faculty_ids
+
+    values = [{'name': name} for name in missing_names]
+    insert = _UPSERT_INSERTS.get(db.session.get_bind().dialect.name)
+    if insert is not None:
+        stmt = insert(Faculty).values(values).on_conflict_do_nothing()
+    else:
+        stmt = db.insert(Faculty).values(values)
+
+    inserted = db.session.execute(stmt.returning(Faculty.name, Faculty.id)).all()
+    faculty_ids.update({name: fid for name, fid in inserted})
+
+    # Rows skipped by ON CONFLICT were inserted concurrently - fetch their ids
+    missing_names -= faculty_ids.keys()
+    if missing_names:
+        rows = db.session.execute(
+            db.select(Faculty.name, Faculty.id).where(Faculty.name.in_(missing_names))
+        ).all()
+        faculty_ids.update({name: fid for name, fid in rows})
+
+    return faculty_ids
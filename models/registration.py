@@ -6,6 +6,12 @@ class Registration(db.Model):
     """Registration model for user's registered course slots."""
     
     __tablename__ = 'registrations'
+    __table_args__ = (
+        # Owner lookups (list/clear registrations, registered-course joins) are
+        # served from the index, including the slot_id they join on
+        db.Index('ix_registration_user_slot', 'user_id', 'slot_id'),
+        db.Index('ix_registration_guest_slot', 'guest_id', 'slot_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     slot_id = db.Column(db.Integer, db.ForeignKey('slots.id'), nullable=False)
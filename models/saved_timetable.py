@@ -1,10 +1,16 @@
-from datetime import datetime
-from .database import db
+import hashlib
+import json
+from .database import db, utcnow
 
 class SavedTimetable(db.Model):
     """Model to store saved timetable configurations."""
     
     __tablename__ = 'saved_timetables'
+    __table_args__ = (
+        # Duplicate check on save: owner + 8-byte hash instead of comparing TEXT
+        db.Index('ix_saved_user_hash', 'user_id', 'slot_ids_hash'),
+        db.Index('ix_saved_guest_hash', 'guest_id', 'slot_ids_hash'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     
@@ -14,12 +20,15 @@ class SavedTimetable(db.Model):
     
     name = db.Column(db.String(200), nullable=False)
     slot_ids_json = db.Column(db.Text, nullable=False)  # JSON string of slot IDs
+    slot_ids_hash = db.Column(db.BigInteger, nullable=True)  # hash_slot_ids_json(slot_ids_json); NULL on legacy rows
     
     # Metadata for quick display without parsing JSON
     total_credits = db.Column(db.Integer, default=0)
     course_count = db.Column(db.Integer, default=0)
     
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Filled by the database (server_default); the Python default covers tables
+    # created before the server default existed, since create_all() never alters columns.
+    created_at = db.Column(db.DateTime(timezone=True), default=utcnow, server_default=db.func.now(), nullable=False)
     
     def to_dict(self):
         return {
@@ -30,3 +39,14 @@ class SavedTimetable(db.Model):
             'course_count': self.course_count,
             'created_at': self.created_at.isoformat()
         }
+
+
+def canonical_slot_ids_json(slot_ids):
+    """Canonical JSON for a set of slot ids (sorted), used for duplicate detection."""
+    return json.dumps(sorted(slot_ids))
+
+
+def hash_slot_ids_json(slot_ids_json):
+    """Stable signed 64-bit hash of a canonical slot ids JSON string (fits BIGINT)."""
+    digest = hashlib.blake2b(slot_ids_json.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
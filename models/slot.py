@@ -1,3 +1,4 @@
+from functools import lru_cache
 from .database import db
 
 
@@ -8,7 +9,7 @@ class Slot(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     slot_code = db.Column(db.String(50), nullable=False)  # e.g., "A11+A12", "B21+E14"
-    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False, index=True)
     faculty_id = db.Column(db.Integer, db.ForeignKey('faculties.id'), nullable=False)
     venue = db.Column(db.String(50), nullable=False)  # e.g., "CR-011", "AB02-330"
     available_seats = db.Column(db.Integer, default=0)
@@ -19,23 +20,49 @@ class Slot(db.Model):
         return f'<Slot {self.slot_code} - {self.venue}>'
     
     def to_dict(self):
+        return Slot.row_to_dict(
+            (self.id, self.slot_code, self.course_id, self.faculty_id, self.venue,
+             self.available_seats, self.total_seats, self.class_nbr),
+            self.course.to_dict() if self.course else None,
+            self.faculty.name if self.faculty else None
+        )
+    
+    @classmethod
+    def dict_columns(cls):
+        """Own columns read by row_to_dict(), for selecting rows without ORM objects."""
+        return (cls.id, cls.slot_code, cls.course_id, cls.faculty_id, cls.venue,
+                cls.available_seats, cls.total_seats, cls.class_nbr)
+    
+    @staticmethod
+    def row_to_dict(row, course, faculty_name):
+        """Serialize a row selected with dict_columns(), given its course dict and faculty name."""
+        slot_id, slot_code, course_id, faculty_id, venue, available_seats, total_seats, class_nbr = row
         return {
-            'id': str(self.id),
-            'slot_code': self.slot_code,
-            'course_id': str(self.course_id),
-            'course': self.course.to_dict() if self.course else None,
-            'faculty_id': str(self.faculty_id),
-            'faculty_name': self.faculty.name if self.faculty else None,
-            'venue': self.venue,
-            'available_seats': self.available_seats,
-            'total_seats': self.total_seats,
-            'class_nbr': self.class_nbr,
+            'id': str(slot_id),
+            'slot_code': slot_code,
+            'course_id': str(course_id),
+            'course': course,
+            'faculty_id': str(faculty_id),
+            'faculty_name': faculty_name,
+            'venue': venue,
+            'available_seats': available_seats,
+            'total_seats': total_seats,
+            'class_nbr': class_nbr,
             'is_full': False  # No seat limit - always allow registration
         }
     
     def get_individual_slots(self):
-        """Parse slot_code like 'A11+A12' into list ['A11', 'A12']."""
-        return self.slot_code.replace('/', '+').split('+')
+        """Parse slot_code like 'A11+A12' into ('A11', 'A12')."""
+        return split_slot_code(self.slot_code)
+
+
+@lru_cache(maxsize=2048)
+def split_slot_code(slot_code):
+    """
+    Split a composite slot code ('A11+A12', 'L1/L2') into its parts, as a tuple.
+    Memoized by code string: the same few hundred codes are parsed on every page.
+    """
+    return tuple(slot_code.replace('/', '+').split('+'))
 
 
 # Slot timing reference - maps slot codes to day and period
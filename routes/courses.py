@@ -1,10 +1,24 @@
-from flask import Blueprint, jsonify, request, session
-from models import db, Course, Slot, Faculty, Registration
+from flask import Blueprint, jsonify, request, session, g, abort
+from models import db, Course, Slot, Registration
+from models.course import delete_courses_cascade
+from models.faculty import get_or_create_faculty_ids
 
 courses_bp = Blueprint('courses', __name__)
 
 def get_scoped_courses():
-    """Get base query for courses visible to current user."""
+    """
+    Get base query for courses visible to current user (built once per request).
+    Returns None when there is no user/guest session - callers short-circuit
+    instead of running a query that can't match anything.
+    """
+    # Query objects are generative (filters return new queries), so the cached
+    # base query can be shared safely by every caller in this request.
+    if 'scoped_courses_query' not in g:
+        g.scoped_courses_query = _build_scoped_courses_query()
+    return g.scoped_courses_query
+
+def _build_scoped_courses_query():
+    """Build the course query scoped to the session's user or guest."""
     user_id = session.get('user_id')
     guest_id = session.get('guest_id')
     
@@ -13,10 +27,15 @@ def get_scoped_courses():
     elif guest_id:
         return Course.query.filter_by(guest_id=guest_id)
     else:
-        # No session, return empty query (or should we return None?)
-        # For safety return a query that matches nothing usually, 
-        # but to be safe return Filter by False
-        return Course.query.filter(db.false())
+        # No session (bots, expired cookies): nothing is visible, skip the DB entirely
+        return None
+
+def get_scoped_course_or_404(course_id):
+    """Fetch a single course owned by the current session, or abort with 404."""
+    base_query = get_scoped_courses()
+    if base_query is None:
+        abort(404)
+    return base_query.filter_by(id=course_id).first_or_404()
 
 @courses_bp.route('/search')
 def search_courses():
@@ -28,32 +47,37 @@ def search_courses():
     
     # Scope query
     base_query = get_scoped_courses()
+    if base_query is None:
+        return jsonify({'courses': []})
     
-    courses = base_query.filter(
+    # The owner filter (indexed) bounds the scan to this user's courses, so a
+    # substring match is cheap. Escape LIKE wildcards typed by the user.
+    # Codes are stored upper-case (see Course.normalize_code), so the code match
+    # is a plain LIKE instead of lower(code) on every row.
+    # Select plain column rows (no ORM objects) - they serialize identically
+    rows = base_query.with_entities(*Course.dict_columns()).filter(
         db.or_(
-            Course.code.ilike(f'%{query_text}%'),
-            Course.name.ilike(f'%{query_text}%')
+            Course.code.contains(query_text.upper(), autoescape=True),
+            Course.name.icontains(query_text, autoescape=True)
         )
     ).limit(20).all()
     
     return jsonify({
-        'courses': [course.to_dict() for course in courses]
+        'courses': [Course.row_to_dict(row) for row in rows]
     })
 
 
 @courses_bp.route('/<course_id>')
 def get_course(course_id):
     """Get course details by ID."""
-    base_query = get_scoped_courses()
-    course = base_query.filter_by(id=course_id).first_or_404()
+    course = get_scoped_course_or_404(course_id)
     return jsonify(course.to_dict())
 
 
 @courses_bp.route('/<course_id>/slots')
 def get_course_slots(course_id):
     """Get all available slots for a course."""
-    base_query = get_scoped_courses()
-    course = base_query.filter_by(id=course_id).first_or_404()
+    course = get_scoped_course_or_404(course_id)
     
     # Slots don't have user_id explicit, but if we found the course,
     # the slots linked to it are authorized.
@@ -71,11 +95,50 @@ def get_course_slots(course_id):
 
 @courses_bp.route('/all')
 def get_all_courses():
-    """Get all courses."""
+    """
+    Get all courses.
+    Optional keyset pagination: ?limit=N returns one page plus a 'next_after'
+    cursor; pass it back as ?after=<cursor> to get the following page.
+    """
+    limit = request.args.get('limit', type=int)
+    after = request.args.get('after', '')
+    
     base_query = get_scoped_courses()
-    courses = base_query.order_by(Course.code).all()
+    if base_query is None:
+        response = {'courses': []}
+        if limit is not None:
+            response['next_after'] = None
+        return jsonify(response)
+    
+    # Order by (code, id) so the (user_id, code) index serves the sort and the
+    # cursor stays stable even if two courses share a code.
+    query = base_query.with_entities(*Course.dict_columns()).order_by(Course.code, Course.id)
+    
+    if after:
+        after_code, _, after_id = after.rpartition(':')
+        try:
+            after_id = int(after_id)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        query = query.filter(db.or_(
+            Course.code > after_code,
+            db.and_(Course.code == after_code, Course.id > after_id)
+        ))
+    
+    if limit is None:
+        # Plain column rows: no ORM objects, identity map or lazy loads
+        return jsonify({
+            'courses': [Course.row_to_dict(row) for row in query.all()]
+        })
+    
+    limit = max(1, min(limit, 500))
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
     return jsonify({
-        'courses': [course.to_dict() for course in courses]
+        'courses': [Course.row_to_dict(row) for row in rows],
+        'next_after': f'{rows[-1].code}:{rows[-1].id}' if has_more else None
     })
 
 
@@ -98,9 +161,19 @@ def add_course_manually():
         return jsonify({'error': 'No active session'}), 401
     
     try:
+        # Look everything up before adding new objects so autoflush has nothing
+        # to write early; all inserts then go out in the single commit flush.
         # Find or create course (Scoped)
         base_query = get_scoped_courses()
-        course = base_query.filter_by(code=data['course_code'].upper()).first()
+        course = base_query.filter_by(code=data['course_code'].strip().upper()).first()
+        
+        # Find or create faculty (Faculty is shared? Or should be scoped?
+        # Faculty names are generic. Let's keep faculty shared for now to avoid DUPLICATE faculty table boom, 
+        # or just create if missing. Faculty has no sensitive data.)
+        # Resolved through the same upsert as uploads and syncs, so concurrent adds
+        # of a new name can't trip the unique constraint on Faculty.name.
+        faculty_name = data.get('faculty', 'N/A').strip() or 'N/A'
+        faculty_id = get_or_create_faculty_ids([faculty_name])[faculty_name]
         
         if not course:
             course = Course(
@@ -117,33 +190,23 @@ def add_course_manually():
                 guest_id=guest_id
             )
             db.session.add(course)
-            db.session.flush()
         
-        # Find or create faculty (Faculty is shared? Or should be scoped?
-        # Faculty names are generic. Let's keep faculty shared for now to avoid DUPLICATE faculty table boom, 
-        # or just create if missing. Faculty has no sensitive data.)
-        faculty_name = data.get('faculty', 'N/A').strip() or 'N/A'
-        faculty = Faculty.query.filter_by(name=faculty_name).first()
-        if not faculty:
-            faculty = Faculty(name=faculty_name)
-            db.session.add(faculty)
-            db.session.flush()
-        
-        # Create slot
+        # Create slot - linked to the course through the relationship (not its id),
+        # so the unit of work orders the INSERTs and fills in the foreign key
+        # without extra flushes
         venue = data.get('venue', 'N/A').strip().upper() or 'N/A'
         slot = Slot(
             slot_code=data['slot_code'].upper(),
-            course_id=course.id,
-            faculty_id=faculty.id,
+            course=course,
+            faculty_id=faculty_id,
             venue=venue,
             available_seats=70,
             total_seats=70
         )
         db.session.add(slot)
-        db.session.flush()
         
         # Auto-register
-        registration = Registration(slot_id=slot.id)
+        registration = Registration(slot=slot)
         if user_id:
             registration.user_id = user_id
         else:
@@ -168,8 +231,7 @@ def add_course_manually():
 @courses_bp.route('/<course_id>', methods=['DELETE'])
 def delete_course(course_id):
     """Delete a course and all associated slots/registrations."""
-    base_query = get_scoped_courses()
-    course = base_query.filter_by(id=course_id).first_or_404()
+    course = get_scoped_course_or_404(course_id)
     
     try:
         db.session.delete(course)
@@ -191,34 +253,20 @@ def bulk_delete_courses():
         
     # Security: Ensure these courses belong to the current user
     base_query = get_scoped_courses()
+    if base_query is None:
+        return jsonify({'message': 'No matching courses found to delete'}), 200
     
     try:
-        # 1. Verify ownership and get valid IDs
-        # We only want to delete courses that are actually owned by this user
-        valid_courses = base_query.filter(Course.id.in_(course_ids)).with_entities(Course.id).all()
-        valid_ids = [c.id for c in valid_courses]
+        # Ownership is enforced by deleting only ids that match the scoped query,
+        # so no separate verification SELECT is needed.
+        owned_ids = base_query.filter(Course.id.in_(course_ids)).with_entities(Course.id).statement
         
-        count = len(valid_ids)
+        # Bulk Delete (Manual Cascade for Performance)
+        # SQLAlchemy ORM cascading is slow for bulk operations (iterates objects).
+        count = delete_courses_cascade(owned_ids)
         if count == 0:
+            db.session.rollback()
             return jsonify({'message': 'No matching courses found to delete'}), 200
-
-        # 2. Bulk Delete Process (Manual Cascade for Performance)
-        # SQLAlchemy ORM cascading is slow for bulk operations (iterates objects).
-        # We manually delete children -> parents using bulk DELETE statements.
-        
-        # A. Find all Slots for these courses
-        slots = Slot.query.filter(Slot.course_id.in_(valid_ids)).with_entities(Slot.id).all()
-        slot_ids = [s.id for s in slots]
-        
-        if slot_ids:
-            # B. Delete Registrations linked to these Slots
-            Registration.query.filter(Registration.slot_id.in_(slot_ids)).delete(synchronize_session=False)
-            
-            # C. Delete Slots
-            Slot.query.filter(Slot.id.in_(slot_ids)).delete(synchronize_session=False)
-            
-        # D. Delete Courses
-        Course.query.filter(Course.id.in_(valid_ids)).delete(synchronize_session=False)
             
         db.session.commit()
         return jsonify({'success': True, 'message': f'Successfully deleted {count} courses'})
@@ -235,48 +283,36 @@ def sync_course_slots(course_id):
     slots_data = data.get('slots', [])
     
     # 1. Get Course (Scoped)
-    base_query = get_scoped_courses()
-    course = base_query.filter_by(id=course_id).first_or_404()
+    course = get_scoped_course_or_404(course_id)
     
     try:
-        # 2. Delete Existing Slots
-        existing_slots = Slot.query.filter_by(course_id=course.id).all()
-        slot_ids = [s.id for s in existing_slots]
-        
-        if slot_ids:
-             Registration.query.filter(Registration.slot_id.in_(slot_ids)).delete(synchronize_session=False)
-             Slot.query.filter(Slot.id.in_(slot_ids)).delete(synchronize_session=False)
+        # 2. Delete Existing Slots (ids resolved in SQL, never materialized in Python)
+        existing_slot_ids = db.select(Slot.id).where(Slot.course_id == course.id)
+        Registration.query.filter(Registration.slot_id.in_(existing_slot_ids)).delete(synchronize_session=False)
+        Slot.query.filter_by(course_id=course.id).delete(synchronize_session=False)
         
-        # 3. Add New Slots (Batch Faculty Lookup to avoid N+1)
+        # 3. Add New Slots (Batch Faculty Lookup + Upsert to avoid N+1)
         # Collect all unique faculty names first
         faculty_names = set(s_data.get('faculty', 'N/A').strip() or 'N/A' for s_data in slots_data)
+        faculty_ids = get_or_create_faculty_ids(faculty_names)
         
-        # Fetch all existing faculties in one query
-        existing_faculties = Faculty.query.filter(Faculty.name.in_(faculty_names)).all()
-        faculty_map = {f.name: f for f in existing_faculties}
-        
-        # Create missing faculties
-        missing_names = faculty_names - set(faculty_map.keys())
-        for name in missing_names:
-            new_faculty = Faculty(name=name)
-            db.session.add(new_faculty)
-            db.session.flush()
-            faculty_map[name] = new_faculty
-        
-        # Now create slots using the map
+        # Now build slot rows using the map and insert them in one batch
+        slot_mappings = []
         for s_data in slots_data:
             fac_name = s_data.get('faculty', 'N/A').strip() or 'N/A'
-            faculty = faculty_map.get(fac_name)
+            seats = int(s_data.get('available_seats', 0))
             
-            new_slot = Slot(
-                slot_code=s_data.get('slot_code', 'N/A').upper(),
-                course_id=course.id,
-                faculty_id=faculty.id if faculty else None,
-                venue=s_data.get('venue', 'N/A').upper(),
-                available_seats=int(s_data.get('available_seats', 0)),
-                total_seats=int(s_data.get('available_seats', 0)) # Default total to avail
-            )
-            db.session.add(new_slot)
+            slot_mappings.append({
+                'slot_code': s_data.get('slot_code', 'N/A').upper(),
+                'course_id': course.id,
+                'faculty_id': faculty_ids.get(fac_name),
+                'venue': s_data.get('venue', 'N/A').upper(),
+                'available_seats': seats,
+                'total_seats': seats  # Default total to avail
+            })
+        
+        if slot_mappings:
+            db.session.bulk_insert_mappings(Slot, slot_mappings)
             
         db.session.commit()
         return jsonify({'success': True, 'message': f'Updated {len(slots_data)} slots for {course.code}'})
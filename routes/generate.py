@@ -1,8 +1,12 @@
 """Routes for auto-generating timetable suggestions."""
 
-from flask import Blueprint, request, jsonify, session, render_template
+from flask import Blueprint, request, jsonify, session, render_template, current_app, g
 from models import db, Course, Slot, Faculty, Registration, User, SavedTimetable
+from models.saved_timetable import canonical_slot_ids_json, hash_slot_ids_json
 from utils.timetable_generator import TimetableGenerator, GenerationPreferences
+from utils.ttl_cache import TTLCache
+from functools import lru_cache
+import json
 import uuid
 
 generate_bp = Blueprint('generate', __name__)
@@ -14,7 +18,7 @@ def generate_page():
     current_user = None
     
     if 'user_id' in session:
-        current_user = User.query.get(session['user_id'])
+        current_user = db.session.get(User, session['user_id'])
     else:
         if 'guest_id' not in session:
             session['guest_id'] = str(uuid.uuid4())
@@ -22,11 +26,78 @@ def generate_page():
     return render_template('generate.html', current_user=current_user)
 
 
+@generate_bp.before_request
+def load_user_scope():
+    """
+    Read the user/guest scope once per request and stash it on `g`.
+    Every endpoint except the page itself needs a session, so reject
+    requests without one here instead of in each view.
+    """
+    g.user_id = session.get('user_id')
+    g.guest_id = session.get('guest_id')
+    if request.endpoint != 'generate.generate_page' and not g.user_id and not g.guest_id:
+        return jsonify({'error': 'No active session'}), 401
+
+
 def get_user_scope():
-    """Get current user/guest scope for queries."""
-    user_id = session.get('user_id')
-    guest_id = session.get('guest_id')
-    return user_id, guest_id
+    """Get current user/guest scope for queries (loaded by load_user_scope)."""
+    return g.user_id, g.guest_id
+
+
+def get_requested_courses(user_id, guest_id, course_ids):
+    """
+    Fetch the requested courses owned by the current user/guest.
+    The result is cached on `g` for the request, so repeated lookups of the
+    same ids (e.g. error/debug paths) don't hit the database again.
+    """
+    key = (user_id, guest_id, tuple(sorted(course_ids)))
+    cache = g.setdefault('requested_courses', {})
+    if key not in cache:
+        owner_filter = Course.user_id == user_id if user_id else Course.guest_id == guest_id
+        cache[key] = Course.query.filter(Course.id.in_(course_ids), owner_filter).all()
+    return cache[key]
+
+
+# Upper bound on ids accepted per request (a timetable has far fewer courses/slots)
+MAX_IDS_PER_REQUEST = 100
+
+
+def parse_ids(raw_ids, max_len=MAX_IDS_PER_REQUEST):
+    """
+    Validate a JSON list of ids (ints or numeric strings from JS) in one pass.
+    Returns de-duplicated ints in their original order, or None if the value
+    isn't a list, is too long, or contains a non-integer.
+    """
+    if not isinstance(raw_ids, list) or len(raw_ids) > max_len:
+        return None
+    try:
+        return list(dict.fromkeys(map(int, raw_ids)))
+    except (ValueError, TypeError):
+        return None
+
+
+def build_preferences(pref_data):
+    """
+    Build GenerationPreferences from the request's 'preferences' object.
+    Instances are memoized by the canonical JSON of the input, so repeated
+    requests (/count -> /suggest -> /more) reuse the same object.
+    Preferences are immutable, so sharing instances is safe.
+    """
+    if not isinstance(pref_data, dict):
+        pref_data = {}
+    return _build_preferences(json.dumps(pref_data, sort_keys=True))
+
+
+@lru_cache(maxsize=256)
+def _build_preferences(pref_json):
+    return GenerationPreferences.from_dict(json.loads(pref_json))
+
+
+# /more pagination: slot-id lists of the solutions already enumerated for a
+# (scope, courses, preferences, loaded slot ids) signature, in enumeration order, so each page
+# continues where the previous one stopped instead of re-walking `offset` solutions.
+MORE_PAGE_SIZE = 5
+_enumerated_solutions = TTLCache(maxsize=256, ttl=300)
 
 
 @generate_bp.route('/available', methods=['GET'])
@@ -37,66 +108,70 @@ def get_available_courses():
     """
     user_id, guest_id = get_user_scope()
     
-    if not user_id and not guest_id:
-        return jsonify({'error': 'No active session'}), 401
-    
-    # Get all courses for this user
     if user_id:
-        courses = Course.query.filter_by(user_id=user_id).all()
-        registrations = Registration.query.filter_by(user_id=user_id).all()
+        course_filter = Course.user_id == user_id
+        registration_filter = Registration.user_id == user_id
     else:
-        courses = Course.query.filter_by(guest_id=guest_id).all()
-        registrations = Registration.query.filter_by(guest_id=guest_id).all()
-    
-    # Batch pre-fetch all slots for these courses to avoid N+1
-    course_ids = [c.id for c in courses]
-    all_slots = Slot.query.filter(Slot.course_id.in_(course_ids)).options(
-        db.joinedload(Slot.faculty)
-    ).all() if course_ids else []
-    
-    # Build a map: course_id -> list of slots
-    slots_by_course = {}
-    for slot in all_slots:
-        slots_by_course.setdefault(slot.course_id, []).append(slot)
-    
-    # Get registered course IDs
-    registered_course_ids = set()
-    for reg in registrations:
-        if reg.slot and reg.slot.course_id:
-            registered_course_ids.add(reg.slot.course_id)
-    
-    # Filter to unregistered courses and collect faculty info
+        course_filter = Course.guest_id == guest_id
+        registration_filter = Registration.guest_id == guest_id
+    
+    # One grouped query: a row per (course, faculty) pair with that pair's slot
+    # count and whether any of those slots is registered by this user/guest.
+    # Outer joins keep courses without slots (faculty NULL, zero slots).
+    rows = db.session.execute(
+        db.select(
+            Course.id, Course.code, Course.name, Course.c, Faculty.name,
+            db.func.count(db.distinct(Slot.id)),
+            db.func.count(Registration.id)
+        )
+        .select_from(Course)
+        .outerjoin(Slot, Slot.course_id == Course.id)
+        .outerjoin(Faculty, Slot.faculty_id == Faculty.id)
+        .outerjoin(Registration, db.and_(Registration.slot_id == Slot.id, registration_filter))
+        .where(course_filter)
+        .group_by(Course.id, Course.code, Course.name, Course.c, Faculty.name)
+        .order_by(Course.id, Faculty.name)
+    ).all()
+    
+    # Fold the rows into one entry per course
     available_courses = []
     all_faculty_names = set()
-    
-    for course in courses:
-        # Get faculties teaching this course from pre-fetched slots
-        faculties = set()
-        course_slots = slots_by_course.get(course.id, [])
-        for slot in course_slots:
-            if slot.faculty:
-                faculties.add(slot.faculty.name)
-                all_faculty_names.add(slot.faculty.name)
+    registered_count = 0
+    current = current_id = None
+    
+    for course_id, code, name, credits, faculty_name, slot_count, registration_count in rows:
+        if course_id != current_id:
+            current_id = course_id
+            current = {
+                'id': str(course_id),  # String to prevent JS precision loss
+                'code': code,
+                'name': name,
+                'credits': credits,
+                'is_registered': False,
+                'slot_count': 0,
+                'faculties': []
+            }
+            available_courses.append(current)
         
-        available_courses.append({
-            'id': str(course.id),  # String to prevent JS precision loss
-            'code': course.code,
-            'name': course.name,
-            'credits': course.c,
-            'is_registered': course.id in registered_course_ids,
-            'slot_count': len(course_slots),
-            'faculties': list(faculties)
-        })
-    
-    return jsonify({
+        current['slot_count'] += slot_count
+        if registration_count and not current['is_registered']:
+            current['is_registered'] = True
+            registered_count += 1
+        if faculty_name:
+            current['faculties'].append(faculty_name)
+            all_faculty_names.add(faculty_name)
+    
+    response = {
         'courses': available_courses,
-        'all_faculties': sorted(list(all_faculty_names)),
-        'registered_count': len(registered_course_ids),
-        'debug': {
+        'all_faculties': sorted(all_faculty_names),
+        'registered_count': registered_count
+    }
+    if current_app.debug:
+        response['debug'] = {
             'user_id': user_id,
             'guest_id': guest_id
         }
-    })
+    return jsonify(response)
 
 
 @generate_bp.route('/count', methods=['POST'])
@@ -112,9 +187,6 @@ def count_timetables():
     """
     user_id, guest_id = get_user_scope()
     
-    if not user_id and not guest_id:
-        return jsonify({'error': 'No active session'}), 401
-    
     data = request.get_json() or {}
     course_ids = data.get('course_ids', [])
     pref_data = data.get('preferences', {})
@@ -123,39 +195,18 @@ def count_timetables():
         return jsonify({'count': 0, 'capped': False})
     
     # Convert string IDs to integers (handles JS precision issue)
-    try:
-        course_ids = [int(cid) for cid in course_ids]
-    except (ValueError, TypeError):
+    course_ids = parse_ids(course_ids)
+    if course_ids is None:
         return jsonify({'error': 'Invalid course ID format'}), 400
     
     # Get courses (scoped to user)
-    if user_id:
-        courses = Course.query.filter(
-            Course.id.in_(course_ids),
-            Course.user_id == user_id
-        ).all()
-    else:
-        courses = Course.query.filter(
-            Course.id.in_(course_ids),
-            Course.guest_id == guest_id
-        ).all()
+    courses = get_requested_courses(user_id, guest_id, course_ids)
     
     if not courses:
         return jsonify({'count': 0, 'capped': False})
     
     # Build preferences
-    # Build preferences
-    preferences = GenerationPreferences(
-        avoid_early_morning=pref_data.get('avoid_early_morning', False),
-        avoid_late_evening=pref_data.get('avoid_late_evening', False),
-        prefer_morning=pref_data.get('prefer_morning', False),
-        prefer_afternoon=pref_data.get('prefer_afternoon', False),
-        preferred_faculties=pref_data.get('preferred_faculties', []),
-        avoided_faculties=pref_data.get('avoided_faculties', []),
-        exclude_slots=pref_data.get('exclude_slots', []),
-        time_mode=pref_data.get('time_mode', 'none'),
-        course_faculty_preferences=pref_data.get('course_faculty_preferences', {})
-    )
+    preferences = build_preferences(pref_data)
     
     # Count solutions
     generator = TimetableGenerator(courses, preferences)
@@ -168,23 +219,27 @@ def count_timetables():
     else:
         count = generator.count_solutions(max_count=max_count)
     
-    # Debug: show slots per course after filtering
-    slots_per_course = {}
-    for course in courses:
-        course_slots = generator.slot_map.get(course.id, [])
-        slots_per_course[course.code] = len(course_slots)
-    
-    return jsonify({
+    response = {
         'count': count,
-        'capped': count >= max_count,
-        'debug': {
+        'capped': count >= max_count
+    }
+    
+    # Debug: show slots per course after filtering (development only)
+    if current_app.debug:
+        slots_per_course = {}
+        for course in courses:
+            course_slots = generator.slot_map.get(course.id, [])
+            slots_per_course[course.code] = len(course_slots)
+        
+        response['debug'] = {
             'courses_count': len(courses),
             'slots_per_course': slots_per_course,
             'preferences': {
-                'avoided_faculties': preferences.avoided_faculties
+                'avoided_faculties': sorted(preferences.avoided_faculties)
             }
         }
-    })
+    
+    return jsonify(response)
 
 
 @generate_bp.route('/suggest', methods=['POST'])
@@ -208,9 +263,6 @@ def suggest_timetable():
     """
     user_id, guest_id = get_user_scope()
     
-    if not user_id and not guest_id:
-        return jsonify({'error': 'No active session'}), 401
-    
     data = request.get_json() or {}
     course_ids = data.get('course_ids', [])
     pref_data = data.get('preferences', {})
@@ -219,33 +271,28 @@ def suggest_timetable():
         return jsonify({'error': 'No courses selected'}), 400
     
     # Ensure course_ids are integers
-    try:
-        course_ids = [int(cid) for cid in course_ids]
-    except (ValueError, TypeError):
+    course_ids = parse_ids(course_ids)
+    if course_ids is None:
         return jsonify({'error': 'Invalid course ID format'}), 400
     
     # Get courses (scoped to user)
-    if user_id:
-        courses = Course.query.filter(
-            Course.id.in_(course_ids),
-            Course.user_id == user_id
-        ).all()
-    else:
-        courses = Course.query.filter(
-            Course.id.in_(course_ids),
-            Course.guest_id == guest_id
-        ).all()
+    courses = get_requested_courses(user_id, guest_id, course_ids)
     
     if not courses:
+        if not current_app.debug:
+            return jsonify({'error': 'No valid courses found'}), 404
+        
         # Debug: provide more info about what exists
-        all_user_courses = []
-        if user_id:
-            all_user_courses = Course.query.filter_by(user_id=user_id).all()
-        else:
-            all_user_courses = Course.query.filter_by(guest_id=guest_id).all()
+        # One query covers both the user's own courses and any unscoped id matches
+        owner_filter = Course.user_id == user_id if user_id else Course.guest_id == guest_id
+        rows = db.session.execute(
+            db.select(Course.id, Course.user_id, Course.guest_id, owner_filter.label('is_owned'))
+            .where(db.or_(owner_filter, Course.id.in_(course_ids)))
+            .order_by(Course.id)
+        ).all()
         
-        # Also check unscoped
-        unscoped_courses = Course.query.filter(Course.id.in_(course_ids)).all()
+        user_course_ids = [row.id for row in rows if row.is_owned]
+        unscoped_courses = [row for row in rows if row.id in course_ids]
         
         return jsonify({
             'error': 'No valid courses found',
@@ -253,26 +300,15 @@ def suggest_timetable():
                 'requested_ids': course_ids,
                 'user_id': user_id,
                 'guest_id': guest_id,
-                'user_course_count': len(all_user_courses),
-                'user_course_ids': [c.id for c in all_user_courses[:10]],  # First 10
+                'user_course_count': len(user_course_ids),
+                'user_course_ids': user_course_ids[:10],  # First 10
                 'unscoped_match_count': len(unscoped_courses),
                 'unscoped_owner_info': [(c.id, c.user_id, c.guest_id) for c in unscoped_courses[:5]]
             }
         }), 404
     
     # Build preferences
-    # Build preferences
-    preferences = GenerationPreferences(
-        avoid_early_morning=pref_data.get('avoid_early_morning', False),
-        avoid_late_evening=pref_data.get('avoid_late_evening', False),
-        prefer_morning=pref_data.get('prefer_morning', False),
-        prefer_afternoon=pref_data.get('prefer_afternoon', False),
-        preferred_faculties=pref_data.get('preferred_faculties', []),
-        avoided_faculties=pref_data.get('avoided_faculties', []),
-        exclude_slots=pref_data.get('exclude_slots', []),
-        time_mode=pref_data.get('time_mode', 'none'),
-        course_faculty_preferences=pref_data.get('course_faculty_preferences', {})
-    )
+    preferences = build_preferences(pref_data)
     
     
     # Generate DIVERSE solutions (very different from each other)
@@ -283,7 +319,12 @@ def suggest_timetable():
     except (ValueError, TypeError):
         limit = 5
         
-    generator = TimetableGenerator(courses, preferences)
+    generator = TimetableGenerator(
+        courses, preferences,
+        time_budget=current_app.config.get('GENERATION_TIME_BUDGET'),
+        workers=current_app.config.get('GENERATION_WORKERS', 1),
+        prepare=False  # generate_unified builds its own randomized slot map
+    )
     
     # Unified Generation Strategy:
     # Handles all 4 scenarios internally:
@@ -305,7 +346,6 @@ def suggest_timetable():
         'has_more': False,
         'generation_method': generation_method,
         'total_combinations': pool_size,
-        'total_combinations': pool_size,
         'relaxed_constraints': False,  # Deprecated but kept for frontend compat
         'warnings': generator.warnings
     })
@@ -326,9 +366,6 @@ def generate_more():
     """
     user_id, guest_id = get_user_scope()
     
-    if not user_id and not guest_id:
-        return jsonify({'error': 'No active session'}), 401
-    
     data = request.get_json() or {}
     course_ids = data.get('course_ids', [])
     pref_data = data.get('preferences', {})
@@ -338,51 +375,54 @@ def generate_more():
         return jsonify({'error': 'No courses selected'}), 400
     
     # Ensure course_ids are integers
-    try:
-        course_ids = [int(cid) for cid in course_ids]
-    except (ValueError, TypeError):
+    course_ids = parse_ids(course_ids)
+    if course_ids is None:
         return jsonify({'error': 'Invalid course ID format'}), 400
     
-    # Get courses (scoped to user) with eager loading
-    eager_opts = (db.joinedload(Course.slots).joinedload(Slot.faculty),)
-    if user_id:
-        courses = Course.query.filter(
-            Course.id.in_(course_ids),
-            Course.user_id == user_id
-        ).options(*eager_opts).all()
-    else:
-        courses = Course.query.filter(
-            Course.id.in_(course_ids),
-            Course.guest_id == guest_id
-        ).options(*eager_opts).all()
+    # Get courses (scoped to user)
+    courses = get_requested_courses(user_id, guest_id, course_ids)
     
     # Fallback if no courses found with scope filter
     if not courses:
         return jsonify({'error': 'No valid courses found'}), 404
     
     # Build preferences
-    preferences = GenerationPreferences(
-        avoid_early_morning=pref_data.get('avoid_early_morning', False),
-        avoid_late_evening=pref_data.get('avoid_late_evening', False),
-        prefer_morning=pref_data.get('prefer_morning', False),
-        prefer_afternoon=pref_data.get('prefer_afternoon', False),
-        preferred_faculties=pref_data.get('preferred_faculties', []),
-        avoided_faculties=pref_data.get('avoided_faculties', []),
-        exclude_slots=pref_data.get('exclude_slots', []),
-        time_mode=pref_data.get('time_mode', 'none'),
-        course_faculty_preferences=pref_data.get('course_faculty_preferences', {})
-    )
+    preferences = build_preferences(pref_data)
     
-    # Generate more solutions
+    try:
+        offset = max(0, int(offset))
+    except (ValueError, TypeError):
+        offset = 0
+    
+    # Generate more solutions, resuming from the solutions earlier pages enumerated.
+    # Slots are only ever inserted or deleted (never edited in place), so the ids the
+    # generator loaded version the courses' data: an upload, sync or delete yields
+    # a new key, on every instance, instead of serving a stale enumeration.
     generator = TimetableGenerator(courses, preferences)
-    solutions = generator.generate_batch(limit=5, offset=offset)
+    slots_version = tuple(sorted(slot.id for slots in generator.slot_map.values() for slot in slots))
+    cache_key = (user_id, guest_id, tuple(sorted(course_ids)), json.dumps(pref_data, sort_keys=True),
+                 slots_version)
+    enumerated = _enumerated_solutions.get(cache_key, [])
+    
+    missing = offset + MORE_PAGE_SIZE - len(enumerated)
+    if missing > 0:
+        seen = {frozenset(slot_ids) for slot_ids in enumerated}
+        enumerated = enumerated + [
+            tuple(s.id for s in solution.slots)
+            for solution in generator.generate(limit=missing, exclude=seen)
+        ]
+        _enumerated_solutions.set(cache_key, enumerated)
+    
+    # Every cached id is among the loaded slots, since they are part of the key
+    solutions = generator.solutions_from_slot_ids(enumerated[offset:offset + MORE_PAGE_SIZE])
+    solutions.sort(key=lambda s: s.score, reverse=True)
     
     return jsonify({
         'success': True,
         'suggestions': [s.to_dict() for s in solutions],
         'count': len(solutions),
         'offset': offset,
-        'has_more': len(solutions) == 5
+        'has_more': len(solutions) == MORE_PAGE_SIZE
     })
 
 
@@ -398,9 +438,6 @@ def apply_suggestion():
     """
     user_id, guest_id = get_user_scope()
     
-    if not user_id and not guest_id:
-        return jsonify({'error': 'No active session'}), 401
-    
     data = request.get_json() or {}
     slot_ids = data.get('slot_ids', [])
     
@@ -408,47 +445,42 @@ def apply_suggestion():
         return jsonify({'error': 'No slots provided'}), 400
     
     # Convert string IDs to integers (handles JS precision issue)
-    try:
-        slot_ids = [int(sid) for sid in slot_ids]
-    except (ValueError, TypeError):
+    slot_ids = parse_ids(slot_ids)
+    if slot_ids is None:
         return jsonify({'error': 'Invalid slot ID format'}), 400
     
-    # Get slots with their courses for ownership verification
-    slots = Slot.query.filter(Slot.id.in_(slot_ids)).all()
-    
-    if len(slots) != len(slot_ids):
+    # Verify existence and ownership with one aggregate query: the outer join
+    # only matches courses owned by this user/guest, so slots of other owners
+    # (or without a course) count as found but not owned.
+    owner_conditions = []
+    if user_id:
+        owner_conditions.append(Course.user_id == user_id)
+    if guest_id:
+        owner_conditions.append(Course.guest_id == guest_id)
+    found_count, owned_count = db.session.execute(
+        db.select(db.func.count(Slot.id), db.func.count(Course.id))
+        .select_from(Slot)
+        .outerjoin(Course, db.and_(Slot.course_id == Course.id, db.or_(*owner_conditions)))
+        .where(Slot.id.in_(slot_ids))
+    ).one()
+    
+    if found_count != len(slot_ids):
         return jsonify({'error': 'Some slots not found'}), 404
     
     # Security: Verify all slots belong to courses owned by this user/guest
-    for slot in slots:
-        if slot.course:
-            course_owner_match = False
-            if user_id and slot.course.user_id == user_id:
-                course_owner_match = True
-            elif guest_id and slot.course.guest_id == guest_id:
-                course_owner_match = True
-            
-            if not course_owner_match:
-                return jsonify({'error': 'Unauthorized: slot does not belong to your courses'}), 403
+    if owned_count != found_count:
+        return jsonify({'error': 'Unauthorized: slot does not belong to your courses'}), 403
     
     try:
         # Clear existing registrations for this user (optional - could make this configurable)
-        if user_id:
-            Registration.query.filter_by(user_id=user_id).delete()
-        else:
-            Registration.query.filter_by(guest_id=guest_id).delete()
-        
-        # Create new registrations
-        registrations = []
-        for slot in slots:
-            reg = Registration(slot_id=slot.id)
-            if user_id:
-                reg.user_id = user_id
-            else:
-                reg.guest_id = guest_id
-            registrations.append(reg)
+        # One DELETE + one INSERT in the same transaction; no rows are loaded
+        # into the session to synchronize it.
+        owner = {'user_id': user_id} if user_id else {'guest_id': guest_id}
+        Registration.query.filter_by(**owner).delete(synchronize_session=False)
         
-        db.session.add_all(registrations)
+        # Create new registrations with one executemany INSERT (no ORM objects)
+        registrations = [{'slot_id': slot_id, **owner} for slot_id in slot_ids]
+        db.session.execute(db.insert(Registration), registrations)
         db.session.commit()
         
         return jsonify({
@@ -466,9 +498,6 @@ def apply_suggestion():
 def get_preview_details():
     """Get details for a list of slot IDs for previewing."""
     user_id, guest_id = get_user_scope()
-    
-    if not user_id and not guest_id:
-        return jsonify({'error': 'No active session'}), 401
         
     data = request.get_json() or {}
     slot_ids = data.get('slot_ids', [])
@@ -477,15 +506,20 @@ def get_preview_details():
         return jsonify({'slots': []})
         
     # Convert to ints
-    try:
-        slot_ids = [int(sid) for sid in slot_ids]
-    except:
+    slot_ids = parse_ids(slot_ids)
+    if slot_ids is None:
         return jsonify({'error': 'Invalid IDs'}), 400
         
-    # Fetch slots with Course and Faculty
-    slots = Slot.query.filter(Slot.id.in_(slot_ids)).options(
-        db.joinedload(Slot.course),
-        db.joinedload(Slot.faculty)
+    # Fetch only the columns needed from Slot, Course and Faculty (no ORM objects);
+    # outer joins keep slots whose course/faculty is missing
+    rows = db.session.execute(
+        db.select(
+            Slot.id, Slot.slot_code, Slot.venue,
+            Course.id, Course.code, Course.name, Course.c, Faculty.name
+        )
+        .outerjoin(Course, Slot.course_id == Course.id)
+        .outerjoin(Faculty, Slot.faculty_id == Faculty.id)
+        .where(Slot.id.in_(slot_ids))
     ).all()
     
     # Format for renderMiniTimetable (needs code, venue, faculty, slot_code)
@@ -495,18 +529,19 @@ def get_preview_details():
     slot_list = []
     total_credits = 0
     
-    for s in slots:
-        if s.course:
-            total_credits += s.course.c
+    for slot_id, slot_code, venue, course_id, course_code, course_name, credits, faculty_name in rows:
+        has_course = course_id is not None
+        if has_course:
+            total_credits += credits
             
         slot_list.append({
-            'slot_id': s.id,
-            'slot_code': s.slot_code,
-            'course_code': s.course.code if s.course else 'N/A',
-            'course_name': s.course.name if s.course else 'N/A',
-            'faculty_name': s.faculty.name if s.faculty else 'TBA',
-            'venue': s.venue,
-            'credits': s.course.c if s.course else 0
+            'slot_id': slot_id,
+            'slot_code': slot_code,
+            'course_code': course_code if has_course else 'N/A',
+            'course_name': course_name if has_course else 'N/A',
+            'faculty_name': faculty_name if faculty_name is not None else 'TBA',
+            'venue': venue,
+            'credits': credits if has_course else 0
         })
         
     return jsonify({
@@ -523,9 +558,6 @@ def save_timetable():
     """Save a timetable configuration."""
     user_id, guest_id = get_user_scope()
     
-    if not user_id and not guest_id:
-        return jsonify({'error': 'No active session'}), 401
-    
     data = request.get_json() or {}
     name = data.get('name', 'Saved Timetable')
     slot_ids = data.get('slot_ids', [])
@@ -536,25 +568,29 @@ def save_timetable():
         return jsonify({'error': 'No slots provided'}), 400
         
     try:
-        import json
         # Sort IDs to ensure canonical representation for duplicate check
-        slot_ids.sort()
-        slot_ids_json = json.dumps(slot_ids)
+        slot_ids_json = canonical_slot_ids_json(slot_ids)
+        slot_ids_hash = hash_slot_ids_json(slot_ids_json)
         
-        # Check for duplicates
+        # Check for duplicates: index seek on the hash, then confirm on the JSON
+        # (guards against collisions; legacy rows saved before the hash have NULL)
         query = SavedTimetable.query
         if user_id:
             query = query.filter_by(user_id=user_id)
         else:
             query = query.filter_by(guest_id=guest_id)
             
-        existing = query.filter_by(slot_ids_json=slot_ids_json).first()
+        existing = query.filter(
+            db.or_(SavedTimetable.slot_ids_hash == slot_ids_hash, SavedTimetable.slot_ids_hash.is_(None)),
+            SavedTimetable.slot_ids_json == slot_ids_json
+        ).first()
         if existing:
             return jsonify({'success': False, 'message': 'This timetable configuration is already saved!'}), 409
 
         saved = SavedTimetable(
             name=name,
             slot_ids_json=slot_ids_json,
+            slot_ids_hash=slot_ids_hash,
             total_credits=total_credits,
             course_count=course_count
         )
@@ -577,9 +613,6 @@ def save_timetable():
 def get_saved_timetables():
     """Get all saved timetables for current user."""
     user_id, guest_id = get_user_scope()
-    
-    if not user_id and not guest_id:
-        return jsonify({'error': 'No active session'}), 401
         
     query = SavedTimetable.query
     if user_id:
@@ -598,11 +631,8 @@ def get_saved_timetables():
 def delete_saved_timetable(saved_id):
     """Delete a saved timetable."""
     user_id, guest_id = get_user_scope()
-    
-    if not user_id and not guest_id:
-        return jsonify({'error': 'No active session'}), 401
         
-    saved = SavedTimetable.query.get(saved_id)
+    saved = db.session.get(SavedTimetable, saved_id)
     if not saved:
         return jsonify({'error': 'Saved timetable not found'}), 404
     
@@ -28,15 +28,17 @@ def index():
     current_user = None
     registrations = []
     
-    # Eager load options
+    # Eager load options (all many-to-one, so one JOINed query with no row fan-out)
     eager_options = (
-        db.joinedload(Registration.slot).joinedload(Slot.course),
-        db.joinedload(Registration.slot).joinedload(Slot.faculty)
+        db.joinedload(Registration.slot).options(
+            db.joinedload(Slot.course),
+            db.joinedload(Slot.faculty)
+        ),
     )
 
     # Check for logged-in user
     if 'user_id' in session:
-        current_user = User.query.get(session['user_id'])
+        current_user = db.session.get(User, session['user_id'])
         registrations = Registration.query.filter_by(user_id=session['user_id']).options(*eager_options).all()
     else:
         # Check/Create guest session
@@ -44,37 +46,41 @@ def index():
             session['guest_id'] = str(uuid.uuid4())
         registrations = Registration.query.filter_by(guest_id=session['guest_id']).options(*eager_options).all()
     
-    # Assign colors to each unique course
+    # Single pass: assign colors to each unique course (in registration order),
+    # build the map of occupied slots and total the credits
     course_colors = {}
-    color_index = 0
-    for reg in registrations:
-        if reg.slot and reg.slot.course:
-            course_code = reg.slot.course.code
-            if course_code not in course_colors:
-                course_colors[course_code] = COURSE_COLORS[color_index % len(COURSE_COLORS)]
-                color_index += 1
-    
-    # Build a map of occupied slots
     occupied_slots = {}
+    total_credits = 0
+    num_colors = len(COURSE_COLORS)
     for reg in registrations:
-        if reg.slot:
-            course_code = reg.slot.course.code if reg.slot.course else ''
-            for slot_code in reg.slot.get_individual_slots():
-                occupied_slots[slot_code] = {
-                    'registration_id': reg.id,
-                    'course_code': course_code,
-                    'course_name': reg.slot.course.name if reg.slot.course else '',
-                    'venue': reg.slot.venue,
-                    'faculty': reg.slot.faculty.name if reg.slot.faculty else '',
-                    'slot_code': reg.slot.slot_code,
-                    'color': course_colors.get(course_code, '#90EE90')
-                }
+        slot = reg.slot
+        if not slot:
+            continue
+        course = slot.course
+        faculty = slot.faculty
+        
+        if course:
+            course_code = course.code
+            color = course_colors.get(course_code)
+            if color is None:
+                color = course_colors[course_code] = COURSE_COLORS[len(course_colors) % num_colors]
+            total_credits += course.c
+        else:
+            course_code = ''
+            color = course_colors.get(course_code, '#90EE90')
+        
+        cell = {
+            'registration_id': reg.id,
+            'course_code': course_code,
+            'course_name': course.name if course else '',
+            'venue': slot.venue,
+            'faculty': faculty.name if faculty else '',
+            'slot_code': slot.slot_code,
+            'color': color
+        }
+        for slot_code in slot.get_individual_slots():
+            occupied_slots[slot_code] = cell
     
-    # Calculate credits
-    total_credits = sum(
-        reg.slot.course.c for reg in registrations 
-        if reg.slot and reg.slot.course
-    )
     course_count = len(registrations)
     
     # Define timetable structure
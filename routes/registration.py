@@ -1,38 +1,91 @@
+from itertools import accumulate, chain
+
 from flask import Blueprint, jsonify, request, session
-from models import db, Registration, Slot, User
-from models.slot import get_slot_timing
+from models import db, Course, Faculty, Registration, Slot, User
+from utils.timetable_generator import slot_code_masks
 
 registration_bp = Blueprint('registration', __name__)
 
-def get_current_registrations_query():
-    """Helper to get registrations query based on current session."""
-    query = None
+def get_registration_owner_filter():
+    """WHERE clause selecting the current session's registrations (None without a session)."""
     if 'user_id' in session:
-        query = Registration.query.filter_by(user_id=session['user_id'])
-    elif 'guest_id' in session:
-        query = Registration.query.filter_by(guest_id=session['guest_id'])
-        
-    if query:
-        # Eager load Slot, Course, and Faculty to prevent N+1 queries
-        return query.options(
-            db.joinedload(Registration.slot).joinedload(Slot.course),
-            db.joinedload(Registration.slot).joinedload(Slot.faculty)
-        )
+        return Registration.user_id == session['user_id']
+    if 'guest_id' in session:
+        return Registration.guest_id == session['guest_id']
     return None
 
+def get_registration_totals():
+    """(registration count, total credits) for the current session, aggregated in SQL."""
+    owner = get_registration_owner_filter()
+    if owner is None:
+        return 0, 0
+    
+    count, credits = db.session.execute(
+        db.select(
+            db.func.count(Registration.id),
+            db.func.coalesce(db.func.sum(Course.c), 0)
+        )
+        .select_from(Registration)
+        .outerjoin(Slot, Registration.slot_id == Slot.id)
+        .outerjoin(Course, Slot.course_id == Course.id)
+        .where(owner)
+    ).one()
+    return count, credits
+
 @registration_bp.route('/', methods=['GET'])
 def get_registrations():
-    """Get all registered courses."""
-    query = get_current_registrations_query()
-    registrations = query.all() if query else []
+    """Get all registered courses (?summary=1 returns only the count and credits)."""
+    if request.args.get('summary') == '1':
+        count, total_credits = get_registration_totals()
+        return jsonify({'count': count, 'total_credits': total_credits})
+    
+    owner = get_registration_owner_filter()
+    if owner is None:
+        return jsonify({'registrations': [], 'count': 0, 'total_credits': 0})
+    
+    # Plain column rows serialized with the models' row_to_dict() helpers:
+    # same payload as Registration.to_dict(), without building ORM objects.
+    # Each row is split back into these groups by slices derived from their sizes.
+    column_groups = (
+        (Registration.id, Registration.slot_id, Registration.registered_at),
+        Slot.dict_columns(),
+        (Faculty.name,),
+        Course.dict_columns(),
+    )
+    ends = list(accumulate(len(group) for group in column_groups))
+    group_slices = [slice(start, end) for start, end in zip([0] + ends[:-1], ends)]
+    rows = db.session.execute(
+        db.select(*chain.from_iterable(column_groups))
+        .select_from(Registration)
+        .outerjoin(Slot, Registration.slot_id == Slot.id)
+        .outerjoin(Course, Slot.course_id == Course.id)
+        .outerjoin(Faculty, Slot.faculty_id == Faculty.id)
+        .where(owner)
+    ).all()
+    
+    registrations = []
+    total_credits = 0
+    for row in rows:
+        (reg_id, slot_id, registered_at), slot_row, (faculty_name,), course_row = (
+            row[group] for group in group_slices
+        )
+        slot_data = None
+        if slot_row[0] is not None:
+            course = Course.row_to_dict(course_row) if course_row[0] is not None else None
+            if course:
+                total_credits += course['c']
+            slot_data = Slot.row_to_dict(slot_row, course, faculty_name)
+        registrations.append({
+            'id': str(reg_id),
+            'slot_id': str(slot_id),
+            'slot': slot_data,
+            'registered_at': registered_at.isoformat() if registered_at else None
+        })
     
     return jsonify({
-        'registrations': [reg.to_dict() for reg in registrations],
+        'registrations': registrations,
         'count': len(registrations),
-        'total_credits': sum(
-            reg.slot.course.c for reg in registrations 
-            if reg.slot and reg.slot.course
-        )
+        'total_credits': total_credits
     })
 
 @registration_bp.route('/', methods=['POST'])
@@ -44,17 +97,23 @@ def register_course():
     if not slot_id:
         return jsonify({'error': 'slot_id is required'}), 400
         
-    query = get_current_registrations_query()
-    if query is None:
+    owner = get_registration_owner_filter()
+    if owner is None:
         return jsonify({'error': 'No active session'}), 401
     
     # Check if slot exists
-    slot = Slot.query.get(slot_id)
+    slot = db.session.get(Slot, slot_id)
     if not slot:
         return jsonify({'error': 'Slot not found'}), 404
     
     # Check if already registered for this course (scoped to user)
-    existing = query.join(Slot).filter(Slot.course_id == slot.course_id).first()
+    # (id-only probe served by the (owner, slot_id) index; no rows are hydrated)
+    existing = db.session.execute(
+        db.select(Registration.id)
+        .join(Slot, Registration.slot_id == Slot.id)
+        .where(owner, Slot.course_id == slot.course_id)
+        .limit(1)
+    ).scalar()
     if existing:
         return jsonify({'error': 'Already registered for this course'}), 400
     
@@ -84,16 +143,16 @@ def register_course():
 @registration_bp.route('/<int:reg_id>', methods=['DELETE'])
 def delete_registration(reg_id):
     """Delete a registration."""
-    # Ensure user owns this registration
-    query = get_current_registrations_query()
-    if query is None:
+    owner = get_registration_owner_filter()
+    if owner is None:
         return jsonify({'error': 'No active session'}), 401
-        
-    registration = query.filter_by(id=reg_id).first()
-    if not registration:
+    
+    # Ownership check and delete in one statement
+    deleted = Registration.query.filter(owner, Registration.id == reg_id).delete(synchronize_session=False)
+    if not deleted:
+        db.session.rollback()
         return jsonify({'error': 'Registration not found'}), 404
         
-    db.session.delete(registration)
     db.session.commit()
     
     return jsonify({'success': True})
@@ -102,8 +161,8 @@ def delete_registration(reg_id):
 @registration_bp.route('/bulk-delete', methods=['POST'])
 def bulk_delete_registrations():
     """Delete multiple registrations at once."""
-    query = get_current_registrations_query()
-    if query is None:
+    owner = get_registration_owner_filter()
+    if owner is None:
         return jsonify({'error': 'No active session'}), 401
     
     data = request.get_json() or {}
@@ -118,16 +177,15 @@ def bulk_delete_registrations():
     except (ValueError, TypeError):
         return jsonify({'error': 'Invalid registration ID format'}), 400
     
-    # Find registrations owned by current user
-    registrations = query.filter(Registration.id.in_(reg_ids)).all()
+    # One DELETE limited to registrations owned by the current user
+    deleted_count = Registration.query.filter(
+        owner, Registration.id.in_(reg_ids)
+    ).delete(synchronize_session=False)
     
-    if not registrations:
+    if not deleted_count:
+        db.session.rollback()
         return jsonify({'error': 'No valid registrations found'}), 404
     
-    deleted_count = len(registrations)
-    for reg in registrations:
-        db.session.delete(reg)
-    
     db.session.commit()
     
     return jsonify({
@@ -144,21 +202,27 @@ def update_registration(reg_id):
     if not new_slot_id:
         return jsonify({'error': 'slot_id is required'}), 400
 
-    query = get_current_registrations_query()
-    if query is None:
+    owner = get_registration_owner_filter()
+    if owner is None:
         return jsonify({'error': 'No active session'}), 401
-        
-    registration = query.filter_by(id=reg_id).first()
-    if not registration:
+    
+    # Owned registration plus its current course id; course/faculty rows aren't needed
+    found = db.session.execute(
+        db.select(Registration, Slot.course_id)
+        .join(Slot, Registration.slot_id == Slot.id)
+        .where(owner, Registration.id == reg_id)
+    ).first()
+    if not found:
         return jsonify({'error': 'Registration not found'}), 404
+    registration, current_course_id = found
         
     # Get new slot
-    new_slot = Slot.query.get(new_slot_id)
+    new_slot = db.session.get(Slot, new_slot_id)
     if not new_slot:
         return jsonify({'error': 'Slot not found'}), 404
         
     # Ensure course matches (can only switch slots within same course)
-    if registration.slot.course_id != new_slot.course_id:
+    if current_course_id != new_slot.course_id:
         return jsonify({'error': 'Cannot change course, only slot'}), 400
         
     # Check clashes (excluding current registration)
@@ -188,7 +252,7 @@ def check_clash():
     if not slot_id:
         return jsonify({'error': 'slot_id is required'}), 400
     
-    slot = Slot.query.get(slot_id)
+    slot = db.session.get(Slot, slot_id)
     if not slot:
         return jsonify({'error': 'Slot not found'}), 404
     
@@ -205,24 +269,21 @@ def check_clash_batch():
     if not slot_ids:
         return jsonify({'results': {}})
         
-    # Get all slots in one query to avoid N+1 inside the loop if possible
-    # But check_slot_clashes takes a slot object. 
-    # Let's fetch all slots first.
-    slots = Slot.query.filter(Slot.id.in_(slot_ids)).all()
-    
-    results = {}
+    # Only the slot codes are needed (no ORM objects)
+    slot_rows = db.session.execute(
+        db.select(Slot.id, Slot.slot_code).where(Slot.id.in_(slot_ids))
+    ).all()
     
-    # We could optimize check_slot_clashes to take a list of slots too, 
-    # but for now iterating here is still way better than N HTTP requests.
-    # The expensive part of check_slot_clashes is `get_current_registrations_query()`, 
-    # which we can cache/fetch once here.
+    # Fetch registrations ONCE and reduce them to masks once for the whole batch
+    registered = prepare_registered_slots(get_registered_slot_rows(), exclude_reg_id)
     
-    # Optimization: Fetch registrations ONCE
-    query = get_current_registrations_query()
-    registrations = query.all() if query else []
-
-    for slot in slots:
-        results[slot.id] = check_slot_clashes(slot, exclude_reg_id=exclude_reg_id, existing_registrations=registrations)
+    # Slots sharing a code (same timing, different faculty) get the same answer
+    results = {}
+    by_code = {}
+    for slot_id, slot_code in slot_rows:
+        if slot_code not in by_code:
+            by_code[slot_code] = find_slot_clashes(slot_code, registered)
+        results[slot_id] = by_code[slot_code]
 
     return jsonify({'results': results})
 
@@ -230,98 +291,103 @@ def check_clash_batch():
 @registration_bp.route('/credits', methods=['GET'])
 def get_credits():
     """Get current credit summary."""
-    query = get_current_registrations_query()
-    registrations = query.all() if query else []
-    
-    total_credits = sum(
-        reg.slot.course.c for reg in registrations 
-        if reg.slot and reg.slot.course
-    )
+    course_count, total_credits = get_registration_totals()
     
     return jsonify({
         'total_credits': total_credits,
         'max_credits': 27,
         'min_credits': 16,
-        'course_count': len(registrations)
+        'course_count': course_count
     })
 
 
-from models.slot import get_slot_timing
-
 # ... (omitted)
 
 def check_slot_clashes(new_slot, exclude_reg_id=None, existing_registrations=None):
     """Check if a new slot clashes with existing registrations."""
-    # Get all individual slots from the new slot
-    new_individual_slots = new_slot.get_individual_slots()
-    
     # Get all registered slots for current user/guest
     if existing_registrations is None:
-        query = get_current_registrations_query()
-        registrations = query.all() if query else []
+        rows = get_registered_slot_rows()
     else:
-        registrations = existing_registrations
-    
-    clashing_slots = []
-    
-    
-    # Mutual Exclusion Groups
-    GROUP_C1 = {'C11', 'C12', 'C13'}
-    GROUP_A2 = {'A21', 'A22', 'A23'}
-    
-    new_slots_set = set(new_individual_slots)
-    
-    for reg in registrations:
+        rows = [
+            (reg.id, reg.slot.slot_code,
+             reg.slot.course.code if reg.slot.course else None,
+             reg.slot.course.name if reg.slot.course else None)
+            for reg in existing_registrations if reg.slot
+        ]
+    
+    registered = prepare_registered_slots(rows, exclude_reg_id)
+    return find_slot_clashes(new_slot.slot_code, registered)
+
+
+def get_registered_slot_rows():
+    """
+    (registration id, slot code, course code, course name) for the current session.
+    Plain column rows: clash checks need nothing else, so no ORM objects are built.
+    """
+    owner = get_registration_owner_filter()
+    if owner is None:
+        return []
+    return db.session.execute(
+        db.select(Registration.id, Slot.slot_code, Course.code, Course.name)
+        .join(Slot, Registration.slot_id == Slot.id)
+        .outerjoin(Course, Slot.course_id == Course.id)
+        .where(owner)
+        .order_by(Registration.id)
+    ).all()
+
+
+def prepare_registered_slots(rows, exclude_reg_id=None):
+    """
+    Reduce get_registered_slot_rows() output to what clash checks need: per
+    registered slot, its (time, C1, A2) masks (cached per slot code) and the fields
+    reported on a clash, plus the OR of all those masks. Lets a batch of checks
+    share one pass over the registrations.
+    """
+    exclude_id = int(exclude_reg_id) if exclude_reg_id else None
+    registered = []
+    union_time = union_c1 = union_a2 = 0
+    for reg_id, slot_code, course_code, course_name in rows:
         # Exclude specified registration (for updates)
-        if exclude_reg_id and reg.id == int(exclude_reg_id):
+        if exclude_id is not None and reg_id == exclude_id:
             continue
+        masks = slot_code_masks(slot_code)
+        registered.append((masks, {
+            'slot_code': slot_code,
+            'course_code': course_code or '',
+            'course_name': course_name or '',
+        }))
+        union_time |= masks[0]
+        union_c1 |= masks[1]
+        union_a2 |= masks[2]
+    return (union_time, union_c1, union_a2), registered
 
-        if reg.slot:
-            registered_individual_slots = reg.slot.get_individual_slots()
-            reg_slots_set = set(registered_individual_slots)
-            
-            # --- Mutual Exclusion Check ---
-            # Check if one set has any C1 slots and the other has any A2 slots
-            has_new_C1 = not new_slots_set.isdisjoint(GROUP_C1)
-            has_new_A2 = not new_slots_set.isdisjoint(GROUP_A2)
-            
-            has_reg_C1 = not reg_slots_set.isdisjoint(GROUP_C1)
-            has_reg_A2 = not reg_slots_set.isdisjoint(GROUP_A2)
-            
-            if (has_new_C1 and has_reg_A2) or (has_new_A2 and has_reg_C1):
-                 clashing_slots.append({
-                    'slot_code': reg.slot.slot_code,
-                    'course_code': reg.slot.course.code if reg.slot.course else '',
-                    'course_name': reg.slot.course.name if reg.slot.course else '',
-                    'reason': 'Mutual exclusion: C1 slots (C11, C12, C13) cannot be taken with A2 slots (A21, A22, A23)'
-                })
-            
-            # Check for overlap
-            for new_s in new_individual_slots:
-                
-                for reg_s in registered_individual_slots:
-                    
-                    # 1. Standard Clash: Same Timing
-                    new_timing = get_slot_timing(new_s)
-                    reg_timing = get_slot_timing(reg_s)
-                    
-                    if new_timing and reg_timing:
-                        if (new_timing['day'] == reg_timing['day'] and 
-                            new_timing['period'] == reg_timing['period']):
-                            clashing_slots.append({
-                                'slot_code': reg.slot.slot_code,
-                                'course_code': reg.slot.course.code if reg.slot.course else '',
-                                'course_name': reg.slot.course.name if reg.slot.course else '',
-                                'reason': 'Time overlap'
-                            })
-                            break
-                    
-
-                
-                if len(clashing_slots) > 0 and clashing_slots[-1] in clashing_slots[:-1]:
-                    # Avoid duplicates
-                     pass
 
+def find_slot_clashes(slot_code, registered):
+    """Clash result for a slot code against prepare_registered_slots() output."""
+    # Occupied (day, period) cells and C1/A2 exclusion-group sides as bitmasks,
+    # so each registration costs a few integer ANDs
+    new_time, new_c1, new_a2 = slot_code_masks(slot_code)
+    (union_time, union_c1, union_a2), entries = registered
+    
+    # Nothing registered touches this slot's cells or exclusion groups
+    if not ((new_time & union_time) or (new_c1 & union_a2) or (new_a2 & union_c1)):
+        return {'has_clash': False, 'clashing_slots': []}
+    
+    clashing_slots = []
+    for (reg_time, reg_c1, reg_a2), info in entries:
+        # Report each clashing registration once, mutual exclusion taking precedence
+        # --- Mutual Exclusion Check ---
+        # Check if one slot has any C1 slots and the other has any A2 slots
+        if (new_c1 & reg_a2) or (new_a2 & reg_c1):
+            reason = 'Mutual exclusion: C1 slots (C11, C12, C13) cannot be taken with A2 slots (A21, A22, A23)'
+        # Check for overlap
+        elif new_time & reg_time:
+            reason = 'Time overlap'
+        else:
+            continue
+        
+        clashing_slots.append({**info, 'reason': reason})
     
     return {
         'has_clash': len(clashing_slots) > 0,
@@ -1,18 +1,29 @@
 from flask import Blueprint, render_template, Response, url_for
 from datetime import datetime, timezone
+from functools import lru_cache
 
 sitemap_bp = Blueprint('sitemap', __name__)
 
+_EMPTY_SITEMAP = '<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"></urlset>'
+
 @sitemap_bp.route('/sitemap.xml')
 def sitemap_xml():
     """Generates an XML sitemap for search engines."""
+    # 'main.index' is the home page; the only per-request inputs are the host and the date
+    index_url = url_for('main.index', _external=True).rstrip('/')
+    today = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+    return Response(_render_sitemap(index_url, today), mimetype='application/xml')
+
+
+@lru_cache(maxsize=8)
+def _render_sitemap(index_url, lastmod):
+    """Rendered sitemap for a host/date (rendered once per process per day)."""
     pages = []
     
     # Static pages
-    # 'main.index' is the home page
     pages.append({
-        'loc': url_for('main.index', _external=True).rstrip('/'),
-        'lastmod': datetime.now(timezone.utc).strftime('%Y-%m-%d'),
+        'loc': index_url,
+        'lastmod': lastmod,
         'changefreq': 'daily',
         'priority': '1.0'
     })
@@ -20,31 +31,35 @@ def sitemap_xml():
     # Auth pages - Removed per best practices (noindex for login)
     # pages.append({
     #     'loc': url_for('auth.login', _external=True),
-    #     'lastmod': datetime.now(timezone.utc).strftime('%Y-%m-%d'),
+    #     'lastmod': lastmod,
     #     'changefreq': 'monthly',
     #     'priority': '0.8'
     # })
     
-    # Render XML
     # Render XML
     try:
         sitemap_xml_content = render_template('sitemap.xml', pages=pages)
         if not sitemap_xml_content:
-            sitemap_xml_content = '<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"></urlset>'
+            sitemap_xml_content = _EMPTY_SITEMAP
     except Exception as e:
         print(f"Error rendering sitemap: {e}")
-        sitemap_xml_content = '<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"></urlset>'
+        sitemap_xml_content = _EMPTY_SITEMAP
     
-    return Response(sitemap_xml_content.strip(), mimetype='application/xml')
+    return sitemap_xml_content.strip()
 
 
 
 @sitemap_bp.route('/robots.txt')
 def robots_txt():
     """Generates robots.txt."""
+    return Response(_render_robots(url_for('sitemap.sitemap_xml', _external=True)), mimetype='text/plain')
+
+
+@lru_cache(maxsize=8)
+def _render_robots(sitemap_url):
     lines = [
         "User-agent: *",
         "Allow: /",
-        f"Sitemap: {url_for('sitemap.sitemap_xml', _external=True)}"
+        f"Sitemap: {sitemap_url}"
     ]
-    return Response('\n'.join(lines), mimetype='text/plain')
+    return '\n'.join(lines)
@@ -1,7 +1,8 @@
 """Routes for HTML/CSV file upload and parsing."""
 
-from flask import Blueprint, request, jsonify, session, Response
-from models import db, Course, Faculty, Slot
+from flask import Blueprint, current_app, request, jsonify, session, Response
+from models import db, Course, Slot
+from models.faculty import get_or_create_faculty_ids
 from utils.html_parser import parse_vtop_html
 from utils.csv_parser import parse_course_csv
 
@@ -47,8 +48,7 @@ def parse_html_file():
         return jsonify({'error': 'File must be HTML or MHTML'}), 400
     
     try:
-        html_content = file.read().decode('utf-8')
-        parsed = parse_vtop_html(html_content)
+        parsed = parse_vtop_html(file.read())
         
         if not parsed['course']:
             return jsonify({'error': 'Could not parse course information from HTML'}), 400
@@ -129,11 +129,12 @@ def import_html_file():
 def _process_single_file_import(file, user_id, guest_id):
     """Helper to process a single file import within the batch."""
     try:
-        file_content = file.read().decode('utf-8')
+        file_content = file.read()
         
         # Route to appropriate parser based on file extension
+        # (HTML/MHTML gets the raw bytes; the parser decodes them once)
         if file.filename.lower().endswith('.csv'):
-            parsed = parse_course_csv(file_content)
+            parsed = parse_course_csv(file_content.decode('utf-8'))
         else:
             parsed = parse_vtop_html(file_content)
         
@@ -141,11 +142,11 @@ def _process_single_file_import(file, user_id, guest_id):
             return {'filename': file.filename, 'status': 'error', 'message': 'Could not parse course info'}
         
         course_data = parsed['course']
-        print(f"DEBUG: Parsed course: {course_data}")
-        print(f"DEBUG: Parsed slots count: {len(parsed['slots'])}")
+        current_app.logger.debug("Import %s: parsed course %s with %d slots",
+                                 file.filename, course_data['code'], len(parsed['slots']))
         
         # Check if course already exists FOR THIS USER
-        query = Course.query.filter_by(code=course_data['code'])
+        query = Course.query.filter_by(code=course_data['code'].strip().upper())
         if user_id:
             query = query.filter_by(user_id=user_id)
         else:
@@ -153,8 +154,10 @@ def _process_single_file_import(file, user_id, guest_id):
             
         course = query.first()
         
+        is_new_course = course is None
+        
         # Start Transaction for this file
-        if not course:
+        if is_new_course:
             course = Course(
                 code=course_data['code'],
                 name=course_data['name'],
@@ -172,56 +175,39 @@ def _process_single_file_import(file, user_id, guest_id):
             db.session.flush()
         
         # --- Batch Process Faculties ---
-        faculty_names = set(s['faculty'] for s in parsed['slots'] if s['faculty'])
-        
-        # Note: In a batch loop, re-querying faculties every time is safe.
-        existing_faculties = Faculty.query.filter(Faculty.name.in_(faculty_names)).all()
-        faculty_map = {f.name: f for f in existing_faculties}
-        
-        missing_names = faculty_names - set(faculty_map.keys())
-        if missing_names:
-            new_facs = []
-            for name in missing_names:
-                f = Faculty(name=name)
-                new_facs.append(f)
-            
-            db.session.add_all(new_facs)
-            db.session.flush()
-            
-            for f in new_facs:
-                faculty_map[f.name] = f
+        # One SELECT plus one multi-row upsert for names not seen before
+        faculty_ids = get_or_create_faculty_ids(s['faculty'] for s in parsed['slots'] if s['faculty'])
 
         # --- Batch Process Slots ---
-        existing_slots = Slot.query.filter_by(course_id=course.id).all()
-        existing_slot_signatures = {(s.slot_code, s.venue) for s in existing_slots}
-        print(f"DEBUG: Existing slot signatures: {existing_slot_signatures}")
+        # A course created just now has no slots, so only re-imports need the lookup
+        if is_new_course:
+            existing_slot_signatures = set()
+        else:
+            existing_slot_signatures = set(db.session.execute(
+                db.select(Slot.slot_code, Slot.venue).where(Slot.course_id == course.id)
+            ).tuples())
         
         slots_to_add = []
         for slot_data in parsed['slots']:
             signature = (slot_data['slot_code'], slot_data['venue'])
-            print(f"DEBUG: Checking slot signature: {signature}")
-            
             if signature not in existing_slot_signatures:
-                faculty = faculty_map.get(slot_data['faculty'])
-                new_slot = Slot(
-                    slot_code=slot_data['slot_code'],
-                    course_id=course.id,
-                    faculty_id=faculty.id if faculty else None,
-                    venue=slot_data['venue'],
-                    available_seats=slot_data['available_seats'],
-                    total_seats=70,
-                    class_nbr=slot_data.get('class_nbr')
-                )
-                slots_to_add.append(new_slot)
+                slots_to_add.append({
+                    'slot_code': slot_data['slot_code'],
+                    'course_id': course.id,
+                    'faculty_id': faculty_ids.get(slot_data['faculty']),
+                    'venue': slot_data['venue'],
+                    'available_seats': slot_data['available_seats'],
+                    'total_seats': 70,
+                    'class_nbr': slot_data.get('class_nbr')
+                })
                 existing_slot_signatures.add(signature)
         
+        # Single executemany INSERT instead of one unit-of-work INSERT per Slot object
         if slots_to_add:
-            db.session.add_all(slots_to_add)
-            slots_added = len(slots_to_add)
-        else:
-            slots_added = 0
+            db.session.execute(db.insert(Slot), slots_to_add)
+        slots_added = len(slots_to_add)
         
-        print(f"DEBUG: Slots to add: {slots_added}")
+        current_app.logger.debug("Import %s: adding %d new slots", file.filename, slots_added)
         
         # Commit per file to avoid huge transactions and ensure partial batch success
         db.session.commit()
@@ -0,0 +1,104 @@
+import sys
+import os
+import unittest
+import uuid
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app, db
+from models import User, Course, Slot, Faculty, Registration
+from models.course import delete_courses_cascade
+from tests.helpers import QueryCounter
+
+
+class TestApplySuggestion(unittest.TestCase):
+    def setUp(self):
+        self.app = app
+        self.app.config['TESTING'] = True
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            unique_id = str(uuid.uuid4())
+            self.prefix = f"P{unique_id[:6].upper()}"
+            self.guest_id = f"guest_{unique_id}"
+            user = User(
+                google_id=f"test_user_{unique_id}",
+                email=f"test_{unique_id}@example.com",
+                name="Test User"
+            )
+            faculty = Faculty(name=f"Test Faculty {unique_id}")
+            db.session.add_all([user, faculty])
+            db.session.commit()
+            self.user_id = user.id
+            self.faculty_id = faculty.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            try:
+                Registration.query.filter_by(user_id=self.user_id).delete(synchronize_session=False)
+                delete_courses_cascade(db.select(Course.id).where(db.or_(
+                    Course.user_id == self.user_id, Course.guest_id == self.guest_id
+                )))
+                Faculty.query.filter_by(id=self.faculty_id).delete()
+                User.query.filter_by(id=self.user_id).delete()
+                db.session.commit()
+            except Exception as e:
+                print(f"Cleanup failed: {e}")
+                db.session.rollback()
+
+    def _add_slots(self, n, **owner):
+        """Create n courses with one slot each for the given owner; returns slot ids as strings."""
+        with self.app.app_context():
+            slots = []
+            for i in range(n):
+                course = Course(
+                    code=f"{self.prefix}{uuid.uuid4().hex[:6]}",
+                    name=f"Course {i}", c=3, course_type="Theory", category="Core", **owner
+                )
+                slots.append(Slot(
+                    slot_code=f"A1{i % 3 + 1}", course=course,
+                    faculty_id=self.faculty_id, venue="AB1-101"
+                ))
+            db.session.add_all(slots)
+            db.session.commit()
+            return [str(slot.id) for slot in slots]
+
+    def _apply(self, slot_ids):
+        with self.app.app_context():
+            with self.client.session_transaction() as sess:
+                sess['user_id'] = self.user_id
+            with QueryCounter(db.engine) as counter:
+                rv = self.client.post('/api/generate/apply', json={'slot_ids': slot_ids})
+            return rv, counter.count
+
+    def test_apply_query_count_is_constant(self):
+        """Ownership checks and inserts must not issue per-slot queries."""
+        rv, small = self._apply(self._add_slots(2, user_id=self.user_id))
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(rv.get_json()['registration_count'], 2)
+
+        rv, large = self._apply(self._add_slots(8, user_id=self.user_id))
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(rv.get_json()['registration_count'], 8)
+        self.assertEqual(small, large)
+
+        with self.app.app_context():
+            self.assertEqual(Registration.query.filter_by(user_id=self.user_id).count(), 8)
+
+    def test_apply_rejects_foreign_and_missing_slots(self):
+        """Slots owned by someone else give 403, unknown ids give 404."""
+        own = self._add_slots(1, user_id=self.user_id)
+        foreign = self._add_slots(1, guest_id=self.guest_id)
+
+        rv, _ = self._apply(own + foreign)
+        self.assertEqual(rv.status_code, 403)
+
+        rv, _ = self._apply(own + ['999999999'])
+        self.assertEqual(rv.status_code, 404)
+
+        with self.app.app_context():
+            self.assertEqual(Registration.query.filter_by(user_id=self.user_id).count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
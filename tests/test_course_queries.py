@@ -0,0 +1,125 @@
+import sys
+import os
+import unittest
+import uuid
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app, db
+from models import User, Course
+from tests.helpers import QueryCounter
+
+
+class TestCourseQueries(unittest.TestCase):
+    def setUp(self):
+        self.app = app
+        self.app.config['TESTING'] = True
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            unique_id = str(uuid.uuid4())
+            self.prefix = f"Q{unique_id[:6].upper()}"
+            user = User(
+                google_id=f"test_user_{unique_id}",
+                email=f"test_{unique_id}@example.com",
+                name="Test User"
+            )
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            try:
+                Course.query.filter_by(user_id=self.user_id).delete(synchronize_session=False)
+                User.query.filter_by(id=self.user_id).delete()
+                db.session.commit()
+            except Exception as e:
+                print(f"Cleanup failed: {e}")
+                db.session.rollback()
+
+    def _add_courses(self, n):
+        with self.app.app_context():
+            start = Course.query.filter_by(user_id=self.user_id).count()
+            for i in range(start, start + n):
+                db.session.add(Course(
+                    code=f"{self.prefix}{i:03d}", name=f"Course {i}", c=3,
+                    course_type="Theory", category="Core", user_id=self.user_id
+                ))
+            db.session.commit()
+
+    def _count_queries(self, url):
+        with self.app.app_context():
+            with self.client.session_transaction() as sess:
+                sess['user_id'] = self.user_id
+            with QueryCounter(db.engine) as counter:
+                rv = self.client.get(url)
+            self.assertEqual(rv.status_code, 200)
+            return counter.count, rv.get_json()
+
+    def test_all_courses_query_count_is_constant(self):
+        """Listing courses must not issue per-row queries."""
+        self._add_courses(2)
+        small, data = self._count_queries('/api/courses/all')
+        self.assertEqual(len(data['courses']), 2)
+
+        self._add_courses(10)
+        large, data = self._count_queries('/api/courses/all')
+        self.assertEqual(len(data['courses']), 12)
+        self.assertEqual(small, large)
+
+    def test_search_query_count_is_constant(self):
+        """Searching courses must not issue per-row queries."""
+        self._add_courses(2)
+        small, data = self._count_queries(f'/api/courses/search?q={self.prefix}')
+        self.assertEqual(len(data['courses']), 2)
+
+        self._add_courses(10)
+        large, data = self._count_queries(f'/api/courses/search?q={self.prefix}')
+        self.assertEqual(len(data['courses']), 12)
+        self.assertEqual(small, large)
+
+    def test_all_courses_keyset_pagination(self):
+        """Paging with ?limit and ?after walks every course exactly once."""
+        self._add_courses(5)
+        with self.app.app_context():
+            with self.client.session_transaction() as sess:
+                sess['user_id'] = self.user_id
+
+            codes = []
+            after = ''
+            while True:
+                rv = self.client.get(f'/api/courses/all?limit=2&after={after}')
+                self.assertEqual(rv.status_code, 200)
+                data = rv.get_json()
+                self.assertLessEqual(len(data['courses']), 2)
+                codes.extend(c['code'] for c in data['courses'])
+                after = data['next_after']
+                if not after:
+                    break
+
+            self.assertEqual(codes, [f"{self.prefix}{i:03d}" for i in range(5)])
+
+    def test_all_courses_etag_revalidation(self):
+        """Repeating a GET with the returned ETag yields an empty 304 until data changes."""
+        self._add_courses(2)
+        with self.app.app_context():
+            with self.client.session_transaction() as sess:
+                sess['user_id'] = self.user_id
+
+            rv = self.client.get('/api/courses/all')
+            etag = rv.headers.get('ETag')
+            self.assertTrue(etag)
+
+            rv = self.client.get('/api/courses/all', headers={'If-None-Match': etag})
+            self.assertEqual(rv.status_code, 304)
+            self.assertEqual(rv.data, b'')
+
+        self._add_courses(1)
+        rv = self.client.get('/api/courses/all', headers={'If-None-Match': etag})
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(len(rv.get_json()['courses']), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,203 @@
+import sys
+import os
+import random
+import unittest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from models import Course, Slot
+from utils.timetable_generator import (
+    TimetableGenerator, find_mask_timetable, slot_code_masks, slot_codes_conflict
+)
+
+
+def make_generator(slot_codes_per_course):
+    """Generator over unsaved courses/slots; slot_codes_per_course[i] lists course i's slot codes."""
+    courses = []
+    slot_map = {}
+    slot_id = 0
+    for index, codes in enumerate(slot_codes_per_course, start=1):
+        course = Course(id=index, code=f"TST{index:04d}", name=f"Course {index}", c=3,
+                        course_type="Theory", category="Core")
+        slots = []
+        for code in codes:
+            slot_id += 1
+            slots.append(Slot(id=slot_id, slot_code=code, course_id=course.id, faculty_id=1, venue="AB1"))
+        courses.append(course)
+        slot_map[course.id] = slots
+    generator = TimetableGenerator(courses, prepare=False)
+    generator.slot_map = slot_map
+    return generator
+
+
+def mask_domains(slot_codes_per_course):
+    """find_mask_timetable domains plus the slot bits handed out, per course."""
+    domains = []
+    bits = []
+    next_bit = 1
+    for codes in slot_codes_per_course:
+        entries = []
+        for code in codes:
+            entries.append((next_bit,) + slot_code_masks(code))
+            next_bit <<= 1
+        domains.append(entries)
+        bits.append([entry[0] for entry in entries])
+    return domains, bits
+
+
+# Hand-built course sets, satisfiable and not
+CASES = [
+    [['A11', 'B11'], ['A11', 'C11'], ['B11']],                # forced chain: B11 -> A11 -> C11
+    [['A11', 'B11'], ['A11', 'B11'], ['A11', 'B11']],         # three courses, two periods
+    [['C11+C12'], ['A21+A22']],                               # C1/A2 mutual exclusion only
+    [['C11+C12', 'D11'], ['A21+A22'], ['D11', 'E11']],
+    [['A11', 'D11'], ['D11', 'E11'], ['E11', 'A11'], ['A11', 'D11', 'E11']],
+    [['A11'], ['B11', 'C11'], ['A11']],                       # first and last course share their only slot
+    [['A11', 'B11', 'C11'], [], ['D11']],                     # a course with no slots
+]
+
+# Theory codes for the seeded random sets
+RANDOM_CODES = ['A11', 'B11', 'C11', 'D11', 'E11', 'C12', 'A21', 'A22', 'D12']
+
+
+class TestGenerateDiverse(unittest.TestCase):
+    def setUp(self):
+        random.seed(1234)
+
+    def random_cases(self, count):
+        rng = random.Random(42)
+        for _ in range(count):
+            yield [
+                ['+'.join(rng.sample(RANDOM_CODES, rng.randint(1, 2))) for _ in range(rng.randint(1, 4))]
+                for _ in range(rng.randint(2, 6))
+            ]
+
+    def assert_valid(self, generator, solutions):
+        for solution in solutions:
+            self.assertEqual(sorted(s.course_id for s in solution.slots),
+                             sorted(course.id for course in generator.courses))
+            for i, slot1 in enumerate(solution.slots):
+                for slot2 in solution.slots[i + 1:]:
+                    self.assertFalse(slot_codes_conflict(slot1.slot_code, slot2.slot_code),
+                                     f"{slot1.slot_code} clashes with {slot2.slot_code}")
+
+    def test_finds_timetable_exactly_when_one_exists(self):
+        for codes in CASES + list(self.random_cases(60)):
+            generator = make_generator(codes)
+            solutions = generator.generate_diverse(limit=3)
+            self.assertEqual(bool(solutions), generator.count_solutions() > 0, codes)
+            self.assert_valid(generator, solutions)
+
+    def test_solutions_are_distinct(self):
+        generator = make_generator([['A11', 'B11', 'C11'], ['D11', 'E11'], ['A21', 'A22']])
+        solutions = generator.generate_diverse(limit=5, min_diversity=0)
+        self.assert_valid(generator, solutions)
+        ids = [frozenset(s.id for s in solution.slots) for solution in solutions]
+        self.assertEqual(len(ids), len(set(ids)))
+
+
+class TestBackjumping(unittest.TestCase):
+    def test_jumps_over_middle_courses(self):
+        # The last course only clashes with the first one's A11; the middle courses
+        # have two free slots each, so stepping back one level at a time would
+        # retry all 8 of their combinations before reaching the first course
+        codes = [['A11', 'B11'], ['D11', 'D12'], ['E11', 'E12'], ['F11', 'F12'], ['A11']]
+        domains, bits = mask_domains(codes)
+        picked, tried = find_mask_timetable(domains, {}, budget=1000)
+        self.assertEqual(picked, [bits[0][1], bits[1][0], bits[2][0], bits[3][0], bits[4][0]])
+        # A11, D11, E11, F11, clashing A11, then B11, D11, E11, F11, A11
+        self.assertEqual(tried, 10)
+
+    def test_jump_target_inherits_culprits(self):
+        # Course 3 is ruled out by courses 0 (A11) and 2 (D11). Course 2 has no other
+        # slot, so it must pass the blame for course 0 on and jump past course 1.
+        codes = [['A11', 'B11'], ['F11'], ['D11'], ['A11', 'D11']]
+        domains, bits = mask_domains(codes)
+        nogoods = {}
+        picked, tried = find_mask_timetable(domains, nogoods, budget=1000)
+        self.assertEqual(picked, [bits[0][1], bits[1][0], bits[2][0], bits[3][0]])
+        self.assertEqual(tried, 9)
+        self.assertIn(bits[0][0] | bits[2][0], nogoods[bits[2][0]])
+        self.assertIn(bits[0][0], nogoods[bits[0][0]])
+
+    def test_no_timetable(self):
+        # Three courses, two periods
+        domains, _ = mask_domains([['A11', 'B11'], ['A11', 'B11'], ['A11', 'B11']])
+        picked, tried = find_mask_timetable(domains, {}, budget=1000)
+        self.assertIsNone(picked)
+        self.assertLess(tried, 1000)
+
+        # C1 and A2 are mutually exclusive
+        domains, _ = mask_domains([['C11+C12'], ['A21+A22']])
+        self.assertIsNone(find_mask_timetable(domains, {}, budget=1000)[0])
+
+        generator = make_generator([['A11', 'B11'], ['A11', 'B11'], ['A11', 'B11']])
+        self.assertEqual(generator.generate_diverse(limit=3), [])
+
+    def test_budget_runs_out(self):
+        domains, _ = mask_domains([['A11', 'B11'], ['D11', 'D12'], ['E11', 'E12'], ['A11']])
+        self.assertEqual(find_mask_timetable(domains, {}, budget=3), (None, 3))
+
+    def test_budget_counts_every_candidate_tested(self):
+        # A single course with a single slot needs exactly one candidate
+        domains, bits = mask_domains([['A11']])
+        self.assertEqual(find_mask_timetable(domains, {}, budget=1), ([bits[0][0]], 1))
+        self.assertEqual(find_mask_timetable(domains, {}, budget=0), (None, 0))
+
+        # The backjumping case above tests 10 candidates to reach its timetable
+        codes = [['A11', 'B11'], ['D11', 'D12'], ['E11', 'E12'], ['F11', 'F12'], ['A11']]
+        domains, _ = mask_domains(codes)
+        picked, tried = find_mask_timetable(domains, {}, budget=10)
+        self.assertIsNotNone(picked)
+        self.assertEqual(tried, 10)
+        self.assertEqual(find_mask_timetable(domains, {}, budget=9), (None, 9))
+
+
+class TestNogoods(unittest.TestCase):
+    # Course 0's first slot (A11) leaves course 2 nothing: both of its slots use A11
+    CODES = [['A11', 'B11'], ['D11'], ['A11', 'A11+C11']]
+
+    def test_dead_end_is_learned(self):
+        domains, bits = mask_domains(self.CODES)
+        nogoods = {}
+        picked, _ = find_mask_timetable(domains, nogoods, budget=100)
+        self.assertEqual(picked, [bits[0][1], bits[1][0], bits[2][0]])
+        self.assertEqual(nogoods, {bits[0][0]: [bits[0][0]]})
+
+    def test_nogood_prunes_later_restart(self):
+        domains, bits = mask_domains(self.CODES)
+        nogoods = {}
+        find_mask_timetable(domains, nogoods, budget=100)
+
+        # A later restart with another course order, as generate_diverse does
+        reordered = [domains[1], domains[0], domains[2]]
+        picked_fresh, tried_fresh = find_mask_timetable(reordered, {}, budget=100)
+        picked_learned, tried_learned = find_mask_timetable(reordered, nogoods, budget=100)
+
+        self.assertEqual(picked_learned, picked_fresh)
+        self.assertEqual(picked_learned, [bits[1][0], bits[0][1], bits[2][0]])
+        # The learned nogood rejects A11 on sight instead of re-failing course 2
+        self.assertEqual(tried_fresh, 6)
+        self.assertEqual(tried_learned, 4)
+
+    def test_shared_nogoods_never_drop_timetables(self):
+        rng = random.Random(7)
+        for _ in range(60):
+            codes = [
+                ['+'.join(rng.sample(RANDOM_CODES, rng.randint(1, 2))) for _ in range(rng.randint(1, 4))]
+                for _ in range(rng.randint(2, 6))
+            ]
+            domains, _ = mask_domains(codes)
+            exists = make_generator(codes).count_solutions() > 0
+            nogoods = {}
+            # Restarts over shuffled course and slot orders, sharing what they learn
+            for _ in range(5):
+                order = [list(domain) for domain in domains]
+                rng.shuffle(order)
+                for domain in order:
+                    rng.shuffle(domain)
+                picked, _ = find_mask_timetable(order, nogoods, budget=10000)
+                self.assertEqual(picked is not None, exists, codes)
+
+
+if __name__ == '__main__':
+    unittest.main()
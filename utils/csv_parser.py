@@ -24,62 +24,51 @@ def parse_course_csv(content: str) -> dict:
     if not content:
         raise ValueError("Empty CSV content")
     
-    lines = content.split('\n')
-    if len(lines) < 4:
+    # One csv.reader pass; rows keep their line positions (blank lines come back as [])
+    rows = list(csv.reader(io.StringIO(content)))
+    if len(rows) < 4:
         raise ValueError("CSV must have at least 4 rows: course headers, course data, slot headers, slot data")
     
     # Parse course header and data (first two rows)
-    course_reader = csv.DictReader(io.StringIO('\n'.join(lines[0:2])))
-    course_headers = set(h.strip().lower() for h in (course_reader.fieldnames or []))
+    course_idx = _header_index(rows[0])
     
     required_course_cols = {'course_code', 'course_name'}
-    missing = required_course_cols - course_headers
+    missing = required_course_cols - course_idx.keys()
     if missing:
         raise ValueError(f"Missing required course columns: {', '.join(missing)}")
     
-    course_row = None
-    for row in course_reader:
-        normalized = {k.strip().lower(): (v.strip() if v else '') for k, v in row.items()}
-        course_code = normalized.get('course_code', '').strip()
-        course_name = normalized.get('course_name', '').strip()
-        
-        if course_code and course_name:
-            course_row = normalized
-            break
+    course_row = rows[1]
+    
+    def course_cell(name):
+        return _cell(course_row, course_idx, name)
     
-    if not course_row:
+    if not (course_cell('course_code') and course_cell('course_name')):
         raise ValueError("No valid course data found in CSV")
     
     course_data = {
-        'code': course_row.get('course_code', '').strip(),
-        'name': course_row.get('course_name', '').strip(),
-        'l': _safe_int(course_row.get('l', '0')),
-        't': _safe_int(course_row.get('t', '0')),
-        'p': _safe_int(course_row.get('p', '0')),
-        'j': _safe_int(course_row.get('j', '0')),
-        'c': _safe_int(course_row.get('c', '0')),
-        'course_type': course_row.get('course_type', 'Theory').strip() or 'Theory',
-        'category': course_row.get('category', 'Elective').strip() or 'Elective',
+        'code': course_cell('course_code'),
+        'name': course_cell('course_name'),
+        'l': _safe_int(course_cell('l')),
+        't': _safe_int(course_cell('t')),
+        'p': _safe_int(course_cell('p')),
+        'j': _safe_int(course_cell('j')),
+        'c': _safe_int(course_cell('c')),
+        'course_type': course_cell('course_type') or 'Theory',
+        'category': course_cell('category') or 'Elective',
     }
     
     # Parse slot header and data (remaining rows starting from row 3)
-    slot_content = '\n'.join(lines[2:])
-    slot_reader = csv.DictReader(io.StringIO(slot_content))
-    slot_headers = set(h.strip().lower() for h in (slot_reader.fieldnames or []))
+    slot_idx = _header_index(rows[2])
     
     required_slot_cols = {'slot_code', 'faculty'}
-    missing = required_slot_cols - slot_headers
+    missing = required_slot_cols - slot_idx.keys()
     if missing:
         raise ValueError(f"Missing required slot columns: {', '.join(missing)}")
     
     slots = []
-    for row in slot_reader:
-        if not any(row.values()):
-            continue
-        
-        normalized = {k.strip().lower(): (v.strip() if v else '') for k, v in row.items()}
-        slot_code = normalized.get('slot_code', '').strip()
-        faculty = normalized.get('faculty', '').strip()
+    for row in rows[3:]:
+        slot_code = _cell(row, slot_idx, 'slot_code')
+        faculty = _cell(row, slot_idx, 'faculty')
         
         if not slot_code or not faculty:
             continue
@@ -87,8 +76,8 @@ def parse_course_csv(content: str) -> dict:
         slots.append({
             'slot_code': slot_code,
             'faculty': faculty,
-            'venue': normalized.get('venue', 'TBA').strip() or 'TBA',
-            'available_seats': _safe_int(normalized.get('available_seats', '70'), default=70),
+            'venue': _cell(row, slot_idx, 'venue') or 'TBA',
+            'available_seats': _safe_int(_cell(row, slot_idx, 'available_seats'), default=70),
             'class_nbr': None,
         })
     
@@ -101,6 +90,17 @@ def parse_course_csv(content: str) -> dict:
     }
 
 
+def _header_index(header_row: list) -> dict:
+    """Map normalized (stripped, lowercased) column names to their positions."""
+    return {h.strip().lower(): i for i, h in enumerate(header_row)}
+
+
+def _cell(row: list, index: dict, name: str) -> str:
+    """Stripped value of a named column, or '' when the column or cell is absent."""
+    i = index.get(name)
+    return row[i].strip() if i is not None and i < len(row) else ''
+
+
 def _safe_int(value: str, default: int = 0) -> int:
     """Safely convert string to int with default."""
     try:
@@ -1,8 +1,12 @@
 """HTML Parser for VIT FFCS course pages."""
 
 from bs4 import BeautifulSoup
+import logging
+import quopri
 import re
 
+logger = logging.getLogger(__name__)
+
 
 def parse_vtop_html(html_content):
     """
@@ -10,22 +14,26 @@ def parse_vtop_html(html_content):
     Handles both registration page format and view slots format.
     
     Args:
-        html_content: Raw HTML string from a saved VTOP page
+        html_content: Raw HTML from a saved VTOP page, as a string or as the
+            uploaded bytes (UTF-8)
         
     Returns:
         dict containing course info and list of slots
     """
+    # Normalize to bytes once: uploads arrive as bytes, other callers pass str
+    if isinstance(html_content, str):
+        html_content = html_content.encode('utf-8')
+    
     # Pre-process: Handle MHTML / Quoted-Printable
-    if 'Content-Transfer-Encoding: quoted-printable' in html_content or 'MIME-Version:' in html_content:
-        import quopri
-        
-        # Decode quoted-printable
+    errors = 'strict'
+    if b'Content-Transfer-Encoding: quoted-printable' in html_content or b'MIME-Version:' in html_content:
         try:
-            # Convert to bytes, decode, then back to string
-            decoded_bytes = quopri.decodestring(html_content.encode('utf-8'))
-            html_content = decoded_bytes.decode('utf-8', errors='ignore')
-        except Exception as e:
-            print(f"MHTML Decode Warning: {e}")
+            html_content = quopri.decodestring(html_content)
+            # Decoded parts may carry other charsets; drop what isn't UTF-8
+            errors = 'ignore'
+        except Exception:
+            logger.warning("MHTML decode failed; parsing the page undecoded", exc_info=True)
+    html_content = html_content.decode('utf-8', errors)
 
     # Strip headers looking for doctype or html tag
     match = re.search(r'(<!DOCTYPE html>|<html)', html_content, re.IGNORECASE)
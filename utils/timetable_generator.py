@@ -3,16 +3,27 @@ Timetable Generator Module
 Generates optimal, clash-free timetable combinations using constraint satisfaction.
 """
 
+import heapq
+import math
 import random
-from typing import List, Dict, Set, Optional, Tuple, Generator
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from itertools import chain, combinations
+from typing import List, Dict, Set, FrozenSet, Optional, Tuple, Generator
 from dataclasses import dataclass, field
-from models import Course, Slot, Faculty
-from models.slot import get_slot_timing, SLOT_TIMINGS
+from models import db, Course, Slot, Faculty
+from models.slot import get_slot_timing, split_slot_code, SLOT_TIMINGS
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class GenerationPreferences:
-    """User preferences for timetable generation."""
+    """
+    User preferences for timetable generation.
+    Immutable: instances are memoized and shared between requests. Name/code
+    collections are frozensets for O(1) membership tests in the hot loops.
+    """
     # Time Constraints (Soft Filters)
     avoid_early_morning: bool = False   # Avoid Period 1 (8:30)
     avoid_late_evening: bool = False    # Avoid Period 7 (18:00)
@@ -27,13 +38,37 @@ class GenerationPreferences:
     max_gaps_per_day: int = 2
     
     # Legacy - Global preferred faculties list (optional usage)
-    preferred_faculties: List[str] = field(default_factory=list)
+    preferred_faculties: FrozenSet[str] = frozenset()
+    
+    # New - Per-course faculty preference, in priority order: {course_id: ('Fac1', 'Fac2', 'Fac3')}
+    course_faculty_preferences: Dict[str, Tuple[str, ...]] = field(default_factory=dict)
     
-    # New - Per-course faculty preference: {course_id: ['Fac1', 'Fac2', 'Fac3']}
-    course_faculty_preferences: Dict[int, List[str]] = field(default_factory=dict)
+    avoided_faculties: FrozenSet[str] = frozenset()
+    exclude_slots: FrozenSet[str] = frozenset()
     
-    avoided_faculties: List[str] = field(default_factory=list)
-    exclude_slots: List[str] = field(default_factory=list)
+    def __post_init__(self):
+        # Accept plain lists from callers; store immutable collections
+        object.__setattr__(self, 'preferred_faculties', frozenset(self.preferred_faculties))
+        object.__setattr__(self, 'avoided_faculties', frozenset(self.avoided_faculties))
+        object.__setattr__(self, 'exclude_slots', frozenset(self.exclude_slots))
+        object.__setattr__(self, 'course_faculty_preferences', {
+            str(course_id): tuple(names) for course_id, names in self.course_faculty_preferences.items()
+        })
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'GenerationPreferences':
+        """Build preferences from a request's 'preferences' JSON object."""
+        return cls(
+            avoid_early_morning=data.get('avoid_early_morning', False),
+            avoid_late_evening=data.get('avoid_late_evening', False),
+            prefer_morning=data.get('prefer_morning', False),
+            prefer_afternoon=data.get('prefer_afternoon', False),
+            preferred_faculties=data.get('preferred_faculties') or (),
+            avoided_faculties=data.get('avoided_faculties') or (),
+            exclude_slots=data.get('exclude_slots') or (),
+            time_mode=data.get('time_mode', 'none'),
+            course_faculty_preferences=data.get('course_faculty_preferences') or {}
+        )
 
 
 @dataclass
@@ -43,31 +78,326 @@ class TimetableSolution:
     score: float                # Quality score (higher is better)
     total_credits: int          # Sum of course credits
     details: Dict               # Additional info (gaps, faculty matches, etc.)
+    # (time-distribution signature, slot-id set), filled on first diversity comparison
+    diversity_key: Optional[Tuple[Tuple, frozenset]] = field(default=None, init=False, repr=False, compare=False)
     
     def to_dict(self):
         return {
-            'slots': [
-                {
-                    'slot_id': str(s.id),  # String to prevent JS precision loss
-                    'slot_code': s.slot_code,
-                    'course_id': str(s.course_id) if s.course_id else '',
-                    'course_code': s.course.code if s.course else '',
-                    'course_name': s.course.name if s.course else '',
-                    'faculty_name': s.faculty.name if s.faculty else '',
-                    'venue': s.venue,
-                    'credits': s.course.c if s.course else 0
-                } for s in self.slots
-            ],
+            'slots': [self._slot_to_dict(s) for s in self.slots],
             'score': round(self.score, 2),
             'total_credits': self.total_credits,
             'details': self.details
         }
+    
+    @staticmethod
+    def _slot_to_dict(s: Slot) -> Dict:
+        # Resolve each relationship once instead of once per field
+        course = s.course
+        faculty = s.faculty
+        return {
+            'slot_id': str(s.id),  # String to prevent JS precision loss
+            'slot_code': s.slot_code,
+            'course_id': str(s.course_id) if s.course_id else '',
+            'course_code': course.code if course else '',
+            'course_name': course.name if course else '',
+            'faculty_name': faculty.name if faculty else '',
+            'venue': s.venue,
+            'credits': course.c if course else 0
+        }
 
 
 # Mutual exclusion groups - these slot sets cannot be taken together
-MUTUAL_EXCLUSION_GROUPS = [
-    ({'C11', 'C12', 'C13'}, {'A21', 'A22', 'A23'}),  # C1 and A2 clash
-]
+# (immutable: cached clash results below are derived from them)
+MUTUAL_EXCLUSION_GROUPS = (
+    (frozenset({'C11', 'C12', 'C13'}), frozenset({'A21', 'A22', 'A23'})),  # C1 and A2 clash
+)
+
+# Teacher priority points by preference rank (1st/2nd/3rd choice); later ranks get none
+FACULTY_RANK_SCORES = (1000, 800, 600)
+
+
+@lru_cache(maxsize=1024)
+def slot_code_timings(slot_code: str) -> frozenset:
+    """
+    (day, period) pairs covered by a slot code like 'A11+A12'.
+    Depends only on the static SLOT_TIMINGS table, so results are cached
+    for the life of the process and shared by every request/generator.
+    """
+    timings = set()
+    for code in split_slot_code(slot_code):
+        timing = get_slot_timing(code)
+        if timing:
+            timings.add((timing['day'], timing['period']))
+    return frozenset(timings)
+
+
+@lru_cache(maxsize=1024)
+def slot_code_distribution(slot_code: str) -> Tuple[frozenset, frozenset, int, int]:
+    """
+    Time-distribution summary of a slot code for timetable signatures:
+    (days, periods, morning cells, afternoon cells). Cached like slot_code_timings.
+    """
+    days = set()
+    periods = set()
+    morning = afternoon = 0
+    for code in split_slot_code(slot_code):
+        timing = get_slot_timing(code)
+        if timing:
+            days.add(timing['day'])
+            periods.add(timing['period'])
+            if timing['period'] <= 3:
+                morning += 1
+            else:
+                afternoon += 1
+    return frozenset(days), frozenset(periods), morning, afternoon
+
+
+@lru_cache(maxsize=8192)
+def slot_codes_conflict(slot_code1: str, slot_code2: str) -> bool:
+    """Check if two slot codes clash (time overlap or mutual exclusion). Cached across requests."""
+    time1, a1, b1 = slot_code_masks(slot_code1)
+    time2, a2, b2 = slot_code_masks(slot_code2)
+    return bool((time1 & time2) or (a1 & b2) or (b1 & a2))
+
+
+# Bit layout for slot masks: one bit per (day, period) cell of the weekly grid
+_DAYS = ['MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT']
+_PERIODS_PER_DAY = max(t['period'] for t in SLOT_TIMINGS.values())
+
+
+@lru_cache(maxsize=1024)
+def slot_code_masks(slot_code: str) -> Tuple[int, int, int]:
+    """
+    Integer bitmasks for a slot code, so clash tests are single AND operations.
+    
+    Returns:
+        (time_mask, group_a_bits, group_b_bits) - time_mask has one bit per
+        occupied (day, period) cell; bit i of group_a_bits/group_b_bits is set when
+        the code uses side A/B of MUTUAL_EXCLUSION_GROUPS[i]. Two slots clash if
+        their time masks overlap or one's A bits meet the other's B bits.
+    """
+    time_mask = 0
+    for day, period in slot_code_timings(slot_code):
+        time_mask |= 1 << (_DAYS.index(day) * _PERIODS_PER_DAY + period - 1)
+    
+    codes = set(split_slot_code(slot_code))
+    group_a_bits = group_b_bits = 0
+    for i, (group_a, group_b) in enumerate(MUTUAL_EXCLUSION_GROUPS):
+        if not codes.isdisjoint(group_a):
+            group_a_bits |= 1 << i
+        if not codes.isdisjoint(group_b):
+            group_b_bits |= 1 << i
+    return time_mask, group_a_bits, group_b_bits
+
+
+def build_random_pool(domains: List[List[Tuple[int, int, int, int]]], target_pool: int,
+                      time_budget: Optional[float] = None, seed: Optional[int] = None,
+                      max_attempts: Optional[int] = None) -> List[Tuple[int, ...]]:
+    """
+    Build up to target_pool distinct random valid timetables.
+    
+    Works on plain data only - per course, a list of (slot_id, *slot_code_masks)
+    tuples - so it can run in a worker process without ORM objects.
+    
+    Args:
+        domains: Candidate slots per course
+        target_pool: Number of distinct timetables to collect
+        time_budget: Optional wall-clock limit in seconds
+        seed: Seed for a private RNG (None uses the module-level random state)
+        max_attempts: Cap on build attempts (default 10 per requested timetable)
+    
+    Returns:
+        List of timetables as tuples of slot ids (in selection order)
+    """
+    rng = random.Random(seed) if seed is not None else random
+    domains = [list(slots) for slots in domains]  # Shuffled in place below
+    num_courses = len(domains)
+    
+    pool = []
+    seen = set()
+    if max_attempts is None:
+        max_attempts = target_pool * 10
+    attempts = 0
+    
+    # Early termination: stop if no new solutions found in N attempts
+    no_progress_count = 0
+    no_progress_limit = 1000  # Stop after 1000 consecutive failures
+    
+    # Time budget: keep whatever pool was built once it runs out
+    deadline = time.monotonic() + time_budget if time_budget else None
+    
+    while len(pool) < target_pool and attempts < max_attempts:
+        attempts += 1
+        if deadline is not None and attempts % 256 == 0 and time.monotonic() > deadline:
+            break
+        
+        # Try to build one random valid timetable
+        selected = []
+        occupied_time = occupied_a = occupied_b = 0
+        order = list(range(num_courses))
+        rng.shuffle(order)
+        
+        for course_index in order:
+            slots = domains[course_index]
+            rng.shuffle(slots)
+            for slot_id, time_mask, a_bits, b_bits in slots[:10]:  # Try up to 10 random slots
+                if (time_mask & occupied_time) or (a_bits & occupied_b) or (b_bits & occupied_a):
+                    continue
+                selected.append(slot_id)
+                occupied_time |= time_mask
+                occupied_a |= a_bits
+                occupied_b |= b_bits
+                break
+            else:
+                break  # Couldn't find valid slot for this course
+        
+        if len(selected) == num_courses:
+            # Sorted id tuple as signature: as cheap to build as a frozenset and
+            # several times smaller to keep in `seen` for a 20k pool
+            sig = tuple(sorted(selected))
+            if sig not in seen:
+                seen.add(sig)
+                pool.append(tuple(selected))
+                no_progress_count = 0  # Reset on success
+            else:
+                no_progress_count += 1
+        else:
+            no_progress_count += 1
+        
+        # Early termination: all combinations likely found
+        if no_progress_count >= no_progress_limit:
+            break
+    
+    return pool
+
+
+def count_mask_combinations(domains: List[Dict[Tuple[int, int, int], int]], max_count: int) -> int:
+    """
+    Count clash-free picks (one per course) over slot masks, capped at max_count.
+    
+    Args:
+        domains: Per course, {slot_code_masks(...) tuple: number of slots sharing it}.
+            Slots with identical masks are interchangeable, so each distinct mask is
+            explored once and its subtree count multiplied by its multiplicity.
+        max_count: Cap on the returned count
+    
+    Returns:
+        min(total combinations, max_count)
+    """
+    # Smallest domains first: prunes earlier, and the count doesn't depend on order
+    domains = sorted((list(d.items()) for d in domains), key=len)
+    num_courses = len(domains)
+    
+    def backtrack(index: int, occupied_time: int, occupied_a: int, occupied_b: int, limit: int) -> int:
+        if index == num_courses:
+            return 1
+        
+        total = 0
+        for (time_mask, a_bits, b_bits), multiplicity in domains[index]:
+            if (time_mask & occupied_time) or (a_bits & occupied_b) or (b_bits & occupied_a):
+                continue
+            # Only need enough of the subtree to reach the remaining limit
+            sub_limit = -(-(limit - total) // multiplicity)
+            total += multiplicity * backtrack(
+                index + 1, occupied_time | time_mask, occupied_a | a_bits, occupied_b | b_bits, sub_limit
+            )
+            if total >= limit:
+                return limit
+        return total
+    
+    return backtrack(0, 0, 0, 0, max_count) if max_count > 0 else 0
+
+
+def find_mask_timetable(domains: List[List[Tuple[int, int, int, int]]], nogoods: Dict[int, List[int]],
+                        budget: int) -> Tuple[Optional[List[int]], int]:
+    """
+    First clash-free pick (one slot per course, tried in domain order), found by
+    backtracking with conflict-directed backjumping and learned dead ends.
+    
+    Args:
+        domains: Per course position, (slot_bit, *slot_code_masks) entries in the
+            order to try them; slot bits are distinct powers of two.
+        nogoods: Learned dead ends, slot bit -> bitsets of slots that can't all be
+            part of one timetable. Read and extended in place, so calls over the
+            same slots (in any course or slot order) can share it.
+        budget: Test at most this many candidates
+    
+    Returns:
+        (slot bit chosen per position, or None if no timetable exists or the budget
+        ran out; number of candidates tried)
+    """
+    num_courses = len(domains)
+    tried = 0
+    
+    # Iterative backtracking: one stack frame per course being placed, holding the
+    # iterator over its remaining slots and the occupancy masks and slot bits of
+    # the slots selected before it
+    selected: List[int] = []
+    stack = [(iter(domains[0]), 0, 0, 0, 0)]
+    # Conflict-directed backjumping: conflicts[i] has bit j set when the course
+    # at position j ruled out one of position i's slots
+    conflicts = [0]
+    
+    while stack:
+        level = len(stack) - 1
+        slots_iter, occupied_time, occupied_a, occupied_b, selected_bits = stack[level]
+        
+        for slot_bit, slot_time, slot_a, slot_b in slots_iter:
+            if tried >= budget:
+                return None, tried
+            tried += 1
+            
+            # Time overlap or mutual exclusion with the selected slots
+            if (slot_time & occupied_time) or (slot_a & occupied_b) or (slot_b & occupied_a):
+                # Blame the earliest course whose selection completes the clash
+                for culprit in range(level):
+                    prefix_time, prefix_a, prefix_b = stack[culprit + 1][1:4]
+                    if (slot_time & prefix_time) or (slot_a & prefix_b) or (slot_b & prefix_a):
+                        break
+                conflicts[level] |= 1 << culprit
+                continue
+            
+            # A learned dead end completed by this slot: blame its other members
+            with_slot = selected_bits | slot_bit
+            nogood = next((ng for ng in nogoods.get(slot_bit, ()) if not ng & ~with_slot), None)
+            if nogood is None:
+                break
+            for j, chosen in enumerate(selected):
+                if chosen & nogood:
+                    conflicts[level] |= 1 << j
+        else:
+            # Course exhausted: jump straight back to the latest course that ruled
+            # out one of its slots - re-picking any course in between can't remove
+            # the clash
+            culprits = conflicts[level]
+            if not culprits:
+                return None, tried
+            
+            # The culprits' selections together leave this course no slot
+            members = [selected[j] for j in range(level) if culprits >> j & 1]
+            nogood = 0
+            for bit in members:
+                nogood |= bit
+            for bit in members:
+                nogoods.setdefault(bit, []).append(nogood)
+            
+            target = culprits.bit_length() - 1
+            del stack[target + 1:]
+            del selected[target:]
+            del conflicts[target + 1:]
+            conflicts[target] |= culprits & ~(1 << target)
+            continue
+        
+        selected.append(slot_bit)
+        if len(selected) == num_courses:
+            return selected, tried
+        
+        stack.append((
+            iter(domains[len(selected)]),
+            occupied_time | slot_time, occupied_a | slot_a, occupied_b | slot_b, with_slot
+        ))
+        conflicts.append(0)
+    return None, tried
 
 
 class TimetableGenerator:
@@ -82,98 +412,109 @@ class TimetableGenerator:
     - Beam search for efficient high-quality solution finding
     """
     
-    def __init__(self, courses: List[Course], preferences: GenerationPreferences = None):
+    def __init__(self, courses: List[Course], preferences: GenerationPreferences = None,
+                 time_budget: Optional[float] = None, workers: int = 1, prepare: bool = True):
         """
         Initialize generator with courses to schedule.
         
         Args:
             courses: List of Course objects user wants to register
             preferences: Optional generation preferences
+            time_budget: Optional wall-clock limit (seconds) for random pool building
+            workers: Processes used to build the random pool (1 = in-process)
+            prepare: Build the scored slot map now. generate_unified() builds its own
+                randomized map, so callers using only it can skip this.
         """
         self.courses = courses
         self.preferences = preferences or GenerationPreferences()
+        self.time_budget = time_budget
+        self.workers = max(1, workers or 1)
         self.slot_map: Dict[int, List[Slot]] = {}  # course_id -> available slots
         
         # Performance caches
-        self._slot_timings_cache: Dict[int, Set[Tuple[str, int]]] = {}  # slot_id -> {(day, period), ...}
-        self._conflict_matrix: Dict[int, Set[int]] = {}  # slot_id -> set of conflicting slot_ids
+        self._slot_bit: Dict[int, int] = {}  # slot_id -> bit index in conflict bitsets
+        self._conflict_matrix: Dict[int, int] = {}  # slot_id -> bitset of conflicting slots
+        self._clash_caches_built = False
         self._slot_scores_cache: Dict[int, float] = {}  # slot_id -> pre-computed score
+        self._slot_metrics_cache: Dict[int, Tuple[int, int, int, int, int]] = {}  # slot_id -> _slot_metrics()
+        self._slot_day_masks_cache: Dict[int, Tuple[Tuple[Tuple[str, int], ...], int]] = {}  # slot_id -> _slot_day_masks()
+        
+        # Excluded slot codes as one time mask (codes map 1:1 to grid cells), so
+        # the exclusion test is a single AND against the slot's cached mask.
+        # Codes without a timing can only match literally, so keep those as a set.
+        self._exclude_set = self.preferences.exclude_slots
+        self._exclude_mask = 0
+        for code in self._exclude_set:
+            self._exclude_mask |= slot_code_masks(code)[0]
+        self._exclude_unknown = frozenset(code for code in self._exclude_set if not get_slot_timing(code))
+        
+        # (course_id, faculty name) -> preference rank, so scoring is one dict
+        # lookup instead of a list scan per slot. First occurrence wins, like list.index().
+        self._faculty_rank: Dict[Tuple[int, str], int] = {}
+        for cid, names in self.preferences.course_faculty_preferences.items():
+            try:
+                course_id = int(cid)
+            except ValueError:
+                continue
+            for rank, name in enumerate(names):
+                self._faculty_rank.setdefault((course_id, name), rank)
+        
+        # Per-cell time score for these preferences (see _compute_slot_score)
+        self._cell_time_scores = self._build_cell_time_scores()
         
         # Warnings collection
         self.warnings: List[str] = []
         
-        # Build initial slot map, filtering out faulty slots
-        self._build_slot_map()
-        
-        # Pre-compute optimizations
-        self._build_timing_cache()
-        self._build_conflict_matrix()
+        if prepare:
+            # Build initial slot map, filtering out faulty slots
+            self._build_slot_map()
     
-    def _build_timing_cache(self):
-        """Pre-compute timing information for all slots."""
-        for course in self.courses:
-            for slot in self.slot_map.get(course.id, []):
-                if slot.id not in self._slot_timings_cache:
-                    timings = set()
-                    for code in slot.get_individual_slots():
-                        timing = get_slot_timing(code)
-                        if timing:
-                            timings.add((timing['day'], timing['period']))
-                    self._slot_timings_cache[slot.id] = timings
+    def _ensure_clash_caches(self):
+        """
+        Build the pairwise conflict matrix on first use.
+        Only AC-3 reads it; the searches test cached slot bitmasks, so they
+        don't pay for the O(n^2) pair scan.
+        """
+        if not self._clash_caches_built:
+            self._build_conflict_matrix()
+            self._clash_caches_built = True
     
     def _build_conflict_matrix(self):
-        """Pre-compute which slots conflict with each other for O(1) clash detection."""
+        """
+        Pre-compute which slots conflict with each other as integer bitsets.
+        Each slot gets a dense bit index, so "does slot X clash with anything in
+        this set" is one AND instead of a loop over the set.
+        """
         all_slots = []
         for course in self.courses:
             all_slots.extend(self.slot_map.get(course.id, []))
         
-        # Initialize empty conflict sets
         for slot in all_slots:
-            self._conflict_matrix[slot.id] = set()
+            self._slot_bit.setdefault(slot.id, len(self._slot_bit))
+            self._conflict_matrix[slot.id] = 0
         
-        # Build conflict relationships
+        # Build conflict relationships (code-pair results are cached process-wide)
         for i, slot1 in enumerate(all_slots):
-            timings1 = self._slot_timings_cache.get(slot1.id, set())
-            codes1 = set(slot1.get_individual_slots())
-            
             for slot2 in all_slots[i+1:]:
                 # Skip same course (we select one slot per course anyway)
                 if slot1.course_id == slot2.course_id:
                     continue
                 
-                timings2 = self._slot_timings_cache.get(slot2.id, set())
-                codes2 = set(slot2.get_individual_slots())
-                
-                # Check time overlap (O(1) set intersection)
-                if timings1 & timings2:
-                    self._conflict_matrix[slot1.id].add(slot2.id)
-                    self._conflict_matrix[slot2.id].add(slot1.id)
-                    continue
-                
-                # Check mutual exclusion groups
-                for group_a, group_b in MUTUAL_EXCLUSION_GROUPS:
-                    has_1_in_a = not codes1.isdisjoint(group_a)
-                    has_1_in_b = not codes1.isdisjoint(group_b)
-                    has_2_in_a = not codes2.isdisjoint(group_a)
-                    has_2_in_b = not codes2.isdisjoint(group_b)
-                    
-                    if (has_1_in_a and has_2_in_b) or (has_1_in_b and has_2_in_a):
-                        self._conflict_matrix[slot1.id].add(slot2.id)
-                        self._conflict_matrix[slot2.id].add(slot1.id)
-                        break
+                if slot_codes_conflict(slot1.slot_code, slot2.slot_code):
+                    self._conflict_matrix[slot1.id] |= 1 << self._slot_bit[slot2.id]
+                    self._conflict_matrix[slot2.id] |= 1 << self._slot_bit[slot1.id]
 
     def _check_clash_fast(self, slot1_id: int, slot2_id: int) -> bool:
-        """O(1) clash detection using pre-computed conflict matrix."""
-        return slot2_id in self._conflict_matrix.get(slot1_id, set())
+        """O(1) clash detection using pre-computed conflict bitsets."""
+        bit = self._slot_bit.get(slot2_id)
+        return bit is not None and bool(self._conflict_matrix.get(slot1_id, 0) >> bit & 1)
     
-    def _has_time_clash_with_occupied(self, slot: Slot, occupied: Set[Tuple[str, int]]) -> bool:
-        """Check if slot's timings overlap with already occupied time slots."""
-        slot_timings = self._slot_timings_cache.get(slot.id, set())
-        return bool(slot_timings & occupied)
-    
-    def _get_slot_timings(self, slot: Slot) -> Set[Tuple[str, int]]:
-        """Get cached timings for a slot."""
-        return self._slot_timings_cache.get(slot.id, set())
+    def _domain_bits(self, slots: List[Slot]) -> int:
+        """Bitset of a course domain over the conflict-matrix slot indices."""
+        bits = 0
+        for slot in slots:
+            bits |= 1 << self._slot_bit[slot.id]
+        return bits
     
     def _build_slot_map(self, randomize_only: bool = False, ignore_preferences: bool = False):
         """
@@ -187,9 +528,11 @@ class TimetableGenerator:
         if not randomize_only: 
              self.warnings = []
 
+        slots_by_course = self._load_slots_by_course(prune_avoided=not ignore_preferences)
+
         for course in self.courses:
             slots = []
-            for slot in course.slots.all():
+            for slot in slots_by_course.get(course.id, []):
                 # CRITICAL: Filter out faulty slots with unknown timings
                 if self._is_slot_faulty(slot):
                     continue
@@ -209,6 +552,34 @@ class TimetableGenerator:
             
             self.slot_map[course.id] = slots
     
+    def _load_slots_by_course(self, prune_avoided: bool = False) -> Dict[int, List[Slot]]:
+        """
+        Load the slots of every course in one query, with their faculty joined in.
+        
+        Args:
+            prune_avoided: If True, drop slots taught by avoided faculties in SQL.
+                (Excluded slot codes stay in _should_exclude_slot: they match parts of
+                composite codes like 'A11+A12', which a plain IN can't express.)
+        
+        Returns:
+            Dict mapping course_id -> list of slots (in id order)
+        """
+        query = (
+            db.select(Slot)
+            .outerjoin(Faculty, Slot.faculty_id == Faculty.id)
+            .options(db.contains_eager(Slot.faculty))
+            .where(Slot.course_id.in_([course.id for course in self.courses]))
+            .order_by(Slot.id)
+        )
+        avoided_faculties = self.preferences.avoided_faculties
+        if prune_avoided and avoided_faculties:
+            query = query.where(db.or_(Faculty.name.is_(None), Faculty.name.notin_(sorted(avoided_faculties))))
+        
+        slots_by_course = {}
+        for slot in db.session.scalars(query):
+            slots_by_course.setdefault(slot.course_id, []).append(slot)
+        return slots_by_course
+    
     def _should_exclude_slot(self, slot: Slot) -> bool:
         """Check if slot should be excluded based on hard constraints."""
         # Check avoided faculty
@@ -216,13 +587,10 @@ class TimetableGenerator:
             return True
         
         # Check excluded slot codes
-        individual_slots = slot.get_individual_slots()
-        for s in individual_slots:
-            if s in self.preferences.exclude_slots:
-                return True
-                
-            # Check Time Constraints
-            # (Removed early/late specific checks)
+        if slot_code_masks(slot.slot_code)[0] & self._exclude_mask:
+            return True
+        if self._exclude_unknown and not self._exclude_unknown.isdisjoint(slot.get_individual_slots()):
+            return True
         
         return False
 
@@ -337,18 +705,21 @@ class TimetableGenerator:
             )
             all_solutions.extend(tier_solutions)
         
-        # Score and rank all solutions
+        # Score all solutions, then build details only for the top target_size
+        # (highest first; ties keep generation order)
+        scores = [self._calculate_solution_total_score(slots) for slots in all_solutions]
+        top_indices = heapq.nlargest(target_size, range(len(scores)), key=scores.__getitem__)
+        
         scored_solutions = []
-        for slots in all_solutions:
-            score = self._calculate_solution_total_score(slots)
+        for i in top_indices:
+            slots = all_solutions[i]
+            score = scores[i]
             total_credits = sum(s.course.c if s.course else 0 for s in slots)
             
             # Count how many preferred teachers
             pref_count = 0
             for slot in slots:
-                cid_str = str(slot.course_id)
-                prefs = self.preferences.course_faculty_preferences.get(cid_str, [])
-                if slot.faculty and slot.faculty.name in prefs:
+                if self._preference_rank(slot) is not None:
                     pref_count += 1
             
             details = self._build_solution_details(slots)
@@ -363,10 +734,7 @@ class TimetableGenerator:
                 details=details
             ))
         
-        # Sort by score (highest first)
-        scored_solutions.sort(key=lambda x: x.score, reverse=True)
-        
-        return scored_solutions[:target_size]
+        return scored_solutions
     
     def _generate_tier(
         self, 
@@ -420,7 +788,8 @@ class TimetableGenerator:
         Returns None if no valid combination found.
         """
         selected: List[Slot] = []
-        occupied: Set[Tuple[str, int]] = set()
+        # Occupied cells and used exclusion-group sides, as bitmasks
+        occupied_time = occupied_a = occupied_b = 0
         
         # Shuffle course order for diversity
         courses = list(self.courses)
@@ -450,31 +819,17 @@ class TimetableGenerator:
             
             found = False
             for slot in pool_copy:
-                # Check clash with selected slots
-                has_clash = False
-                for existing in selected:
-                    if self._check_clash(slot, existing):
-                        has_clash = True
-                        break
+                # Clash with selected slots: time overlap or mutual exclusion
+                time_mask, a_bits, b_bits = slot_code_masks(slot.slot_code)
+                if (time_mask & occupied_time) or (a_bits & occupied_b) or (b_bits & occupied_a):
+                    continue
                 
-                if not has_clash:
-                    # Check time overlap
-                    slot_times = set()
-                    time_clash = False
-                    for code in slot.get_individual_slots():
-                        timing = get_slot_timing(code)
-                        if timing:
-                            key = (timing['day'], timing['period'])
-                            if key in occupied:
-                                time_clash = True
-                                break
-                            slot_times.add(key)
-                    
-                    if not time_clash:
-                        selected.append(slot)
-                        occupied.update(slot_times)
-                        found = True
-                        break
+                selected.append(slot)
+                occupied_time |= time_mask
+                occupied_a |= a_bits
+                occupied_b |= b_bits
+                found = True
+                break
             
             if not found:
                 return None  # Couldn't find valid slot for this course
@@ -512,13 +867,27 @@ class TimetableGenerator:
         if not pool:
             return []
         
-        # Calculate metrics for each timetable
+        # Calculate metrics for each timetable (only those the chosen ranking reads)
+        # by summing per-slot parts that are computed once per slot
+        slot_metrics = self._slot_metrics
+        use_priority = has_teacher_prefs and not has_time_prefs
         scored_pool = []
         for slots in pool:
-            teacher_match_count = self._count_preferred_teachers(slots)
-            time_score = self._calculate_time_score(slots)
-            teacher_priority_score = self._calculate_teacher_priority_score(slots)
-            total_credits = sum(s.course.c if s.course else 0 for s in slots)
+            time_sum = cell_count = matches = priority = total_credits = 0
+            for slot in slots:
+                slot_time, slot_cells, matched, points, credits = slot_metrics(slot)
+                time_sum += slot_time
+                cell_count += slot_cells
+                matches += matched
+                priority += points
+                total_credits += credits
+            
+            teacher_match_count = matches if has_teacher_prefs else 0
+            if has_time_prefs:
+                time_score = time_sum / cell_count if cell_count > 0 else 0
+            else:
+                time_score = 0.0
+            teacher_priority_score = float(priority) if use_priority else 0.0
             
             scored_pool.append({
                 'slots': slots,
@@ -544,179 +913,159 @@ class TimetableGenerator:
     def _generate_random_solutions(self, target_size: int) -> List[TimetableSolution]:
         """Generate random timetables without any ranking (no filters scenario)."""
         self._build_slot_map(randomize_only=True, ignore_preferences=True)
+        domains, slots_by_id = self._random_domains()
+        if not domains:
+            return []
         
-        solutions = []
-        seen = set()
-        max_attempts = target_size * 100
-        attempts = 0
+        # No ranking follows, so sample exactly target_size distinct timetables
+        id_pool = build_random_pool(domains, target_size, self.time_budget, max_attempts=target_size * 100)
         
-        while len(solutions) < target_size and attempts < max_attempts:
-            attempts += 1
-            result = self._try_random_timetable()
-            if result:
-                sig = frozenset(s.id for s in result)
-                if sig not in seen:
-                    seen.add(sig)
-                    total_credits = sum(s.course.c if s.course else 0 for s in result)
-                    solutions.append(TimetableSolution(
-                        slots=result,
-                        score=0,  # No scoring for random
-                        total_credits=total_credits,
-                        details={'method': 'random', 'pool_size': len(solutions)}
-                    ))
+        solutions = []
+        for ids in id_pool:
+            result = [slots_by_id[slot_id] for slot_id in ids]
+            total_credits = sum(s.course.c if s.course else 0 for s in result)
+            solutions.append(TimetableSolution(
+                slots=result,
+                score=0,  # No scoring for random
+                total_credits=total_credits,
+                details={'method': 'random', 'pool_size': len(solutions)}
+            ))
         
         return solutions
     
+    def _random_domains(self) -> Tuple[List[List[Tuple[int, int, int, int]]], Dict[int, Slot]]:
+        """
+        Plain (slot_id, masks) domains per course from slot_map: cheap to test and
+        safe to send to worker processes. Domains are empty if any course has no slots.
+        """
+        domains = []
+        slots_by_id = {}
+        for course in self.courses:
+            slots = self.slot_map.get(course.id, [])
+            if not slots:
+                return [], {}
+            domains.append([(slot.id,) + slot_code_masks(slot.slot_code) for slot in slots])
+            slots_by_id.update((slot.id, slot) for slot in slots)
+        return domains, slots_by_id
+    
     def _generate_random_pool(self, target_pool: int = 20000) -> List[List[Slot]]:
         """Generate a pool of random valid timetables with early termination."""
         self._build_slot_map(randomize_only=True, ignore_preferences=True)
-        self._build_timing_cache()
-        self._build_conflict_matrix()
         
-        pool = []
-        seen = set()
-        max_attempts = target_pool * 10
-        attempts = 0
+        domains, slots_by_id = self._random_domains()
+        if not domains:
+            return []
         
-        # Early termination: stop if no new solutions found in N attempts
-        no_progress_count = 0
-        no_progress_limit = 1000  # Stop after 1000 consecutive failures
+        if self.workers > 1:
+            id_pool = self._build_random_pool_parallel(domains, target_pool)
+        else:
+            id_pool = build_random_pool(domains, target_pool, self.time_budget)
         
-        while len(pool) < target_pool and attempts < max_attempts:
-            attempts += 1
-            result = self._try_random_timetable()
-            
-            if result:
-                sig = frozenset(s.id for s in result)
-                if sig not in seen:
-                    seen.add(sig)
-                    pool.append(result)
-                    no_progress_count = 0  # Reset on success
-                else:
-                    no_progress_count += 1
-            else:
-                no_progress_count += 1
-            
-            # Early termination: all combinations likely found
-            if no_progress_count >= no_progress_limit:
-                break
+        return [[slots_by_id[slot_id] for slot_id in ids] for ids in id_pool]
+    
+    def _build_random_pool_parallel(self, domains: List[List[Tuple[int, int, int, int]]],
+                                    target_pool: int) -> List[Tuple[int, ...]]:
+        """Shard pool building across worker processes (independent seeds), then merge distinct results."""
+        workers = self.workers
+        shard_size = -(-target_pool // workers)
+        seeds = [random.randrange(2 ** 32) for _ in range(workers)]
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                shards = list(executor.map(
+                    build_random_pool,
+                    [domains] * workers, [shard_size] * workers, [self.time_budget] * workers, seeds
+                ))
+        except (OSError, NotImplementedError, BrokenProcessPool):
+            # No usable process support (e.g. serverless sandbox) - build inline
+            return build_random_pool(domains, target_pool, self.time_budget)
         
-        return pool
+        pool = []
+        seen = set()
+        for ids in chain.from_iterable(shards):
+            sig = tuple(sorted(ids))
+            if sig not in seen:
+                seen.add(sig)
+                pool.append(ids)
+        return pool[:target_pool]
     
-    def _try_random_timetable(self) -> Optional[List[Slot]]:
-        """Try to build one random valid timetable."""
-        selected = []
-        occupied = set()
+    def _slot_metrics(self, slot: Slot) -> Tuple[int, int, int, int, int]:
+        """
+        Per-slot parts of the pool ranking metrics, computed once per slot:
+        (time score sum, timed cell count, preferred-teacher match, teacher priority
+        points, credits). Timetable metrics are sums of these, so scoring a 20k pool
+        doesn't re-parse slot codes or walk ORM attributes for every entry.
+        """
+        metrics = self._slot_metrics_cache.get(slot.id)
+        if metrics is not None:
+            return metrics
         
-        courses = list(self.courses)
-        random.shuffle(courses)
+        mode = self.preferences.time_mode
+        avoid_early = self.preferences.avoid_early_morning
+        avoid_late = self.preferences.avoid_late_evening
         
-        for course in courses:
-            slots = self.slot_map.get(course.id, [])
-            if not slots:
-                return None
-            
-            random.shuffle(slots)
-            found = False
-            
-            for slot in slots[:10]:  # Try up to 10 random slots
-                has_clash = False
-                for existing in selected:
-                    if self._check_clash(slot, existing):
-                        has_clash = True
-                        break
+        time_sum = 0
+        cell_count = 0
+        for code in slot.get_individual_slots():
+            timing = get_slot_timing(code)
+            if timing:
+                period = timing['period']
+                cell_count += 1
                 
-                if not has_clash:
-                    slot_times = set()
-                    time_clash = False
-                    for code in slot.get_individual_slots():
-                        timing = get_slot_timing(code)
-                        if timing:
-                            key = (timing['day'], timing['period'])
-                            if key in occupied:
-                                time_clash = True
-                                break
-                            slot_times.add(key)
-                    
-                    if not time_clash:
-                        selected.append(slot)
-                        occupied.update(slot_times)
-                        found = True
-                        break
-            
-            if not found:
-                return None
-        
-        return selected if len(selected) == len(self.courses) else None
+                # Apply avoid penalties first
+                if avoid_early and period == 1:
+                    time_sum += 0  # Strongly penalize 8:30 slots
+                elif avoid_late and period == 7:
+                    time_sum += 0  # Strongly penalize 6:00 PM slots
+                elif mode == 'morning':
+                    time_sum += max(0, 115 - (15 * period))
+                elif mode == 'afternoon' or mode == 'evening':
+                    time_sum += max(0, 10 + (15 * (period - 1)))
+                elif mode == 'middle':
+                    dist = abs(period - 4)
+                    time_sum += max(0, 100 - (30 * dist))
+                else:
+                    time_sum += 50
+        
+        # Teacher preference: match flag and rank points (1st/2nd/3rd choice)
+        rank = self._preference_rank(slot)
+        matched = 0
+        priority = 0
+        if rank is not None:
+            matched = 1
+            if rank < len(FACULTY_RANK_SCORES):
+                priority = FACULTY_RANK_SCORES[rank]
+        
+        credits = slot.course.c if slot.course else 0
+        metrics = (time_sum, cell_count, matched, priority, credits)
+        self._slot_metrics_cache[slot.id] = metrics
+        return metrics
     
     def _count_preferred_teachers(self, slots: List[Slot]) -> int:
         """Count how many courses have a preferred teacher."""
-        count = 0
-        for slot in slots:
-            cid_str = str(slot.course_id)
-            prefs = self.preferences.course_faculty_preferences.get(cid_str, [])
-            if slot.faculty and slot.faculty.name in prefs:
-                count += 1
-        return count
+        return sum(self._slot_metrics(slot)[2] for slot in slots)
     
     def _calculate_time_score(self, slots: List[Slot]) -> float:
         """Calculate time preference score for a timetable."""
-        mode = self.preferences.time_mode
-        avoid_early = self.preferences.avoid_early_morning
-        avoid_late = self.preferences.avoid_late_evening
-        
         total_score = 0.0
         cell_count = 0
-        
         for slot in slots:
-            for code in slot.get_individual_slots():
-                timing = get_slot_timing(code)
-                if timing:
-                    period = timing['period']
-                    cell_count += 1
-                    
-                    # Apply avoid penalties first
-                    if avoid_early and period == 1:
-                        total_score += 0  # Strongly penalize 8:30 slots
-                    elif avoid_late and period == 7:
-                        total_score += 0  # Strongly penalize 6:00 PM slots
-                    elif mode == 'morning':
-                        total_score += max(0, 115 - (15 * period))
-                    elif mode == 'afternoon' or mode == 'evening':
-                        total_score += max(0, 10 + (15 * (period - 1)))
-                    elif mode == 'middle':
-                        dist = abs(period - 4)
-                        total_score += max(0, 100 - (30 * dist))
-                    else:
-                        total_score += 50
+            time_sum, cells = self._slot_metrics(slot)[:2]
+            total_score += time_sum
+            cell_count += cells
         
         return total_score / cell_count if cell_count > 0 else 0
     
     def _calculate_teacher_priority_score(self, slots: List[Slot]) -> float:
         """Calculate teacher priority score (higher = better priority matches)."""
-        total_score = 0.0
-        
-        for slot in slots:
-            cid_str = str(slot.course_id)
-            prefs = self.preferences.course_faculty_preferences.get(cid_str, [])
-            
-            if slot.faculty and slot.faculty.name in prefs:
-                rank = prefs.index(slot.faculty.name)
-                if rank == 0:
-                    total_score += 1000
-                elif rank == 1:
-                    total_score += 800
-                elif rank == 2:
-                    total_score += 600
-        
-        return total_score
+        return 0.0 + sum(self._slot_metrics(slot)[3] for slot in slots)
     
     def _rank_by_time(self, scored_pool: List[Dict], target_size: int) -> List[TimetableSolution]:
         """SCENARIO 2: TIME ONLY - rank by time score."""
-        scored_pool.sort(key=lambda x: x['time_score'], reverse=True)
+        # Top-N selection (same order as a stable descending sort) instead of sorting the whole pool
+        top_items = heapq.nlargest(target_size, scored_pool, key=lambda x: x['time_score'])
         
         results = []
-        for item in scored_pool[:target_size]:
+        for item in top_items:
             details = self._build_solution_details(item['slots'])
             details['method'] = 'time_ranked'
             details['time_score'] = round(item['time_score'], 2)
@@ -733,71 +1082,53 @@ class TimetableGenerator:
     
     def _rank_tiered_by_teacher_priority(self, scored_pool: List[Dict], target_size: int) -> List[TimetableSolution]:
         """SCENARIO 3: TEACHER ONLY - tier by count, rank by priority within tier."""
-        num_courses = len(self.courses)
-        results = []
+        # Tier (match count) first, then priority score: one top-N pass over the pool
+        top_items = heapq.nlargest(
+            target_size, scored_pool,
+            key=lambda x: (x['teacher_match_count'], x['teacher_priority_score'])
+        )
         
-        # Group by teacher match count (tier)
-        for tier in range(num_courses, -1, -1):
-            tier_items = [x for x in scored_pool if x['teacher_match_count'] == tier]
-            
-            # Sort by teacher priority score within tier
-            tier_items.sort(key=lambda x: x['teacher_priority_score'], reverse=True)
-            
-            for item in tier_items:
-                if len(results) >= target_size:
-                    break
-                
-                details = self._build_solution_details(item['slots'])
-                details['method'] = 'tiered_teacher_priority'
-                details['teacher_match_count'] = item['teacher_match_count']
-                details['teacher_priority_score'] = round(item['teacher_priority_score'], 2)
-                details['tier'] = tier
-                details['pool_size'] = len(scored_pool)
-                
-                results.append(TimetableSolution(
-                    slots=item['slots'],
-                    score=item['teacher_priority_score'],
-                    total_credits=item['total_credits'],
-                    details=details
-                ))
+        results = []
+        for item in top_items:
+            details = self._build_solution_details(item['slots'])
+            details['method'] = 'tiered_teacher_priority'
+            details['teacher_match_count'] = item['teacher_match_count']
+            details['teacher_priority_score'] = round(item['teacher_priority_score'], 2)
+            details['tier'] = item['teacher_match_count']
+            details['pool_size'] = len(scored_pool)
             
-            if len(results) >= target_size:
-                break
+            results.append(TimetableSolution(
+                slots=item['slots'],
+                score=item['teacher_priority_score'],
+                total_credits=item['total_credits'],
+                details=details
+            ))
         
         return results
     
     def _rank_tiered_by_time(self, scored_pool: List[Dict], target_size: int) -> List[TimetableSolution]:
         """SCENARIO 4: BOTH - tier by teacher count, rank by time within tier."""
-        num_courses = len(self.courses)
-        results = []
+        # Tier (match count) first, then TIME score (not teacher priority): one top-N pass
+        top_items = heapq.nlargest(
+            target_size, scored_pool,
+            key=lambda x: (x['teacher_match_count'], x['time_score'])
+        )
         
-        # Group by teacher match count (tier)
-        for tier in range(num_courses, -1, -1):
-            tier_items = [x for x in scored_pool if x['teacher_match_count'] == tier]
-            
-            # Sort by TIME score within tier (not teacher priority)
-            tier_items.sort(key=lambda x: x['time_score'], reverse=True)
-            
-            for item in tier_items:
-                if len(results) >= target_size:
-                    break
-                
-                details = self._build_solution_details(item['slots'])
-                details['method'] = 'tiered_time_ranked'
-                details['teacher_match_count'] = item['teacher_match_count']
-                details['time_score'] = round(item['time_score'], 2)
-                details['tier'] = tier
-                details['pool_size'] = len(scored_pool)
-                
-                results.append(TimetableSolution(
-                    slots=item['slots'],
-                    score=item['time_score'],
-                    total_credits=item['total_credits'],
-                    details=details
-                ))
+        results = []
+        for item in top_items:
+            details = self._build_solution_details(item['slots'])
+            details['method'] = 'tiered_time_ranked'
+            details['teacher_match_count'] = item['teacher_match_count']
+            details['time_score'] = round(item['time_score'], 2)
+            details['tier'] = item['teacher_match_count']
+            details['pool_size'] = len(scored_pool)
             
-            if len(results) >= target_size:
-                break
+            results.append(TimetableSolution(
+                slots=item['slots'],
+                score=item['time_score'],
+                total_credits=item['total_credits'],
+                details=details
+            ))
         
         return results
 
@@ -812,6 +1143,8 @@ class TimetableGenerator:
         if len(self.courses) < 2:
             return True
         
+        self._ensure_clash_caches()
+        
         # Queue of arcs (course_id pairs) to process
         queue = [(c1.id, c2.id) for c1 in self.courses for c2 in self.courses if c1.id != c2.id]
         
@@ -833,23 +1166,16 @@ class TimetableGenerator:
         Returns:
             True if domain was revised (slots removed), False otherwise.
         """
-        revised = False
-        slots_to_remove = []
-        
-        for slot1 in self.slot_map.get(c1_id, []):
-            has_support = False
-            for slot2 in self.slot_map.get(c2_id, []):
-                if not self._check_clash_fast(slot1.id, slot2.id):
-                    has_support = True
-                    break
-            if not has_support:
-                slots_to_remove.append(slot1)
-                revised = True
+        domain1 = self.slot_map.get(c1_id, [])
+        domain2_bits = self._domain_bits(self.slot_map.get(c2_id, []))
         
-        for slot in slots_to_remove:
-            self.slot_map[c1_id].remove(slot)
+        # slot1 is supported if some c2 slot lies outside its conflict bitset
+        supported = [slot1 for slot1 in domain1 if domain2_bits & ~self._conflict_matrix[slot1.id]]
+        if len(supported) == len(domain1):
+            return False
         
-        return revised
+        self.slot_map[c1_id] = supported
+        return True
 
     def generate_beam_search(self, beam_width: int = 100, target_size: int = 100) -> List[TimetableSolution]:
         """
@@ -877,45 +1203,34 @@ class TimetableGenerator:
             return []
         
         # Initialize beams with first course's slots
-        # beam = (score, selected_slots, occupied_times)
-        beams: List[Tuple[float, List[Slot], Set[Tuple[str, int]]]] = []
+        # beam = (score, selected_slots, occupied time mask, group A bits, group B bits)
+        beams: List[Tuple[float, List[Slot], int, int, int]] = []
         first_course = sorted_courses[0]
         
         for slot in self.slot_map.get(first_course.id, [])[:beam_width * 2]:  # Start with more for diversity
             score = self._score_slot(slot)
-            occupied = self._get_slot_timings(slot)
-            beams.append((score, [slot], occupied))
+            beams.append((score, [slot], *slot_code_masks(slot.slot_code)))
         
-        # Sort and keep top beam_width
-        beams.sort(key=lambda x: x[0], reverse=True)
-        beams = beams[:beam_width]
+        # Keep top beam_width
+        beams = heapq.nlargest(beam_width, beams, key=lambda x: x[0])
         
         # Expand beam for each subsequent course
         for course in sorted_courses[1:]:
-            new_beams: List[Tuple[float, List[Slot], Set[Tuple[str, int]]]] = []
-            available_slots = self.slot_map.get(course.id, [])
+            new_beams: List[Tuple[float, List[Slot], int, int, int]] = []
+            available_slots = [(slot, slot_code_masks(slot.slot_code)) for slot in self.slot_map.get(course.id, [])]
             
-            for (score, selected, occupied) in beams:
-                for slot in available_slots:
-                    # Fast clash check using cached data
-                    if self._has_time_clash_with_occupied(slot, occupied):
+            for (score, selected, occupied_time, occupied_a, occupied_b) in beams:
+                for slot, (slot_time, slot_a, slot_b) in available_slots:
+                    # Time overlap or mutual exclusion with any selected slot
+                    if (slot_time & occupied_time) or (slot_a & occupied_b) or (slot_b & occupied_a):
                         continue
                     
-                    # Check against all selected slots using conflict matrix
-                    has_conflict = False
-                    for sel_slot in selected:
-                        if self._check_clash_fast(slot.id, sel_slot.id):
-                            has_conflict = True
-                            break
-                    
-                    if not has_conflict:
-                        new_score = score + self._score_slot(slot)
-                        new_occupied = occupied | self._get_slot_timings(slot)
-                        new_beams.append((new_score, selected + [slot], new_occupied))
+                    new_score = score + self._score_slot(slot)
+                    new_beams.append((new_score, selected + [slot], occupied_time | slot_time,
+                                      occupied_a | slot_a, occupied_b | slot_b))
             
             # Keep top beam_width candidates
-            new_beams.sort(key=lambda x: x[0], reverse=True)
-            beams = new_beams[:beam_width]
+            beams = heapq.nlargest(beam_width, new_beams, key=lambda x: x[0])
             
             if not beams:
                 break  # No valid solutions at this level
@@ -924,7 +1239,7 @@ class TimetableGenerator:
         solutions = []
         seen = set()
         
-        for (score, slots, _) in beams:
+        for (score, slots, *_) in beams:
             if len(slots) != len(self.courses):
                 continue  # Incomplete solution
                 
@@ -949,6 +1264,47 @@ class TimetableGenerator:
         
         return solutions
     
+    def _slot_day_masks(self, slot: Slot) -> Tuple[Tuple[Tuple[str, int], ...], int]:
+        """
+        Periods a slot occupies as one bitmask per day (bit p = period p), in the
+        order its cells first touch each day, plus its number of Saturday cells.
+        Cached per slot id.
+        """
+        entry = self._slot_day_masks_cache.get(slot.id)
+        if entry is None:
+            day_masks: Dict[str, int] = {}
+            saturday = 0
+            for code in slot.get_individual_slots():
+                timing = get_slot_timing(code)
+                if timing:
+                    day = timing['day']
+                    day_masks[day] = day_masks.get(day, 0) | (1 << timing['period'])
+                    if day == 'SAT':
+                        saturday += 1
+            entry = self._slot_day_masks_cache[slot.id] = (tuple(day_masks.items()), saturday)
+        return entry
+    
+    def _fill_day_gaps(self, slots: List[Slot], details: Dict) -> int:
+        """
+        Fill details['gaps_per_day'] and add to details['saturday_classes'] for a
+        selection of slots; returns the total gap count. Free periods between a
+        day's first and last class are the span minus the occupied periods.
+        """
+        day_masks: Dict[str, int] = {}
+        for slot in slots:
+            slot_days, saturday = self._slot_day_masks(slot)
+            for day, mask in slot_days:
+                day_masks[day] = day_masks.get(day, 0) | mask
+            details['saturday_classes'] += saturday
+        
+        total_gaps = 0
+        for day, mask in day_masks.items():
+            lowest = (mask & -mask).bit_length()
+            gaps = mask.bit_length() - lowest + 1 - mask.bit_count()
+            details['gaps_per_day'][day] = gaps
+            total_gaps += gaps
+        return total_gaps
+    
     def _build_solution_details(self, slots: List[Slot]) -> Dict:
         """Build details dict for a solution."""
         details = {
@@ -959,36 +1315,11 @@ class TimetableGenerator:
         
         # Count preferred faculty matches
         for slot in slots:
-            if slot.faculty and slot.course_id:
-                cid_str = str(slot.course_id)
-                if cid_str in self.preferences.course_faculty_preferences:
-                    if slot.faculty.name in self.preferences.course_faculty_preferences[cid_str]:
-                        details['preferred_faculty_matches'] += 1
+            if self._preference_rank(slot) is not None:
+                details['preferred_faculty_matches'] += 1
         
         # Calculate gaps per day
-        day_periods: Dict[str, List[int]] = {}
-        for slot in slots:
-            for s in slot.get_individual_slots():
-                timing = get_slot_timing(s)
-                if timing:
-                    day = timing['day']
-                    if day not in day_periods:
-                        day_periods[day] = []
-                    day_periods[day].append(timing['period'])
-                    
-                    if day == 'SAT':
-                        details['saturday_classes'] += 1
-        
-        total_gaps = 0
-        for day, periods in day_periods.items():
-            periods.sort()
-            gaps = 0
-            for i in range(1, len(periods)):
-                gap = periods[i] - periods[i-1] - 1
-                if gap > 0:
-                    gaps += gap
-            details['gaps_per_day'][day] = gaps
-            total_gaps += gaps
+        total_gaps = self._fill_day_gaps(slots, details)
         
         details['total_gaps'] = total_gaps
         return details
@@ -1024,7 +1355,8 @@ class TimetableGenerator:
             random.shuffle(course_ids)
             
             current_solution = []
-            occupied = set()
+            # Picked slots' time cells and exclusion-group sides as bitmasks
+            occupied_time = occupied_a = occupied_b = 0
             valid_attempt = True
             
             for cid in course_ids:
@@ -1036,36 +1368,33 @@ class TimetableGenerator:
                 # Pick ONE random slot. 
                 # (Since we want 20,000 unique ones, simple random choice is fastest)
                 # If we iterate candidates, it becomes a DFS which is slow for 20k target.
-                # Let's try up to 5 random picks per course to reduce dead ends
-                candidates = random.sample(slots, min(len(slots), 5))
+                # Let's try up to 5 random picks per course to reduce dead ends.
+                # Picks are drawn lazily (distinct, like random.sample) with the tried
+                # indices kept as a bitmask, since the first pick usually fits.
+                num_slots = len(slots)
+                picks_left = min(num_slots, 5)
+                tried = 0
                 
                 found_slot = False
-                for slot in candidates:
-                    # Check clash against existing
-                    is_clash = False
-                    for existing in current_solution:
-                        if self._check_clash(slot, existing):
-                            is_clash = True
-                            break
+                while picks_left:
+                    i = random.randrange(num_slots)
+                    if (tried >> i) & 1:
+                        continue
+                    tried |= 1 << i
+                    picks_left -= 1
+                    slot = slots[i]
                     
-                    if not is_clash:
-                        # Check internal time clash
-                        new_occupied = set()
-                        time_clash = False
-                        for s in slot.get_individual_slots():
-                            timing = get_slot_timing(s)
-                            if timing:
-                                key = (timing['day'], timing['period'])
-                                if key in occupied:
-                                    time_clash = True
-                                    break
-                                new_occupied.add(key)
-                        
-                        if not time_clash:
-                            occupied.update(new_occupied)
-                            current_solution.append(slot)
-                            found_slot = True
-                            break 
+                    # Time overlap or mutual exclusion with anything already picked
+                    slot_time, slot_a, slot_b = slot_code_masks(slot.slot_code)
+                    if (slot_time & occupied_time) or (slot_a & occupied_b) or (slot_b & occupied_a):
+                        continue
+                    
+                    occupied_time |= slot_time
+                    occupied_a |= slot_a
+                    occupied_b |= slot_b
+                    current_solution.append(slot)
+                    found_slot = True
+                    break
                 
                 if not found_slot:
                     valid_attempt = False
@@ -1079,24 +1408,21 @@ class TimetableGenerator:
                     pool_solutions.append(current_solution)
         
         # 3. Score and Rank (No Filtering, just Penalties)
-        scored_solutions = []
-        
-        for slots in pool_solutions:
-            # Calculate score (penalties are applied inside score function)
-            score = self._calculate_solution_total_score(slots)
-            total_credits = sum(s.course.c if s.course else 0 for s in slots)
-            sol = TimetableSolution(
-                slots=slots,
-                score=score,
-                total_credits=total_credits,
+        # Score every pool entry (penalties are applied inside score function), then
+        # build solution objects only for the best target_size of them.
+        # Higher score = Better, Lower score = More violations
+        scores = [self._calculate_solution_total_score(slots) for slots in pool_solutions]
+        top_indices = heapq.nlargest(target_size, range(len(scores)), key=scores.__getitem__)
+        
+        return [
+            TimetableSolution(
+                slots=pool_solutions[i],
+                score=scores[i],
+                total_credits=sum(s.course.c if s.course else 0 for s in pool_solutions[i]),
                 details={'from_pool_size': len(pool_solutions)}
             )
-            scored_solutions.append(sol)
-            
-        # Sort descending (Higher score = Better, Lower score = More violations)
-        scored_solutions.sort(key=lambda x: x.score, reverse=True)
-        
-        return scored_solutions[:target_size]
+            for i in top_indices
+        ]
 
     def generate_exhaustive(self, max_solutions: int = 20000, target_size: int = 100) -> List[TimetableSolution]:
         """
@@ -1118,55 +1444,56 @@ class TimetableGenerator:
         all_solutions: List[List[Slot]] = []
         seen_signatures = set()
         
-        def backtrack(index: int, selected: List[Slot], occupied: Set[Tuple[str, int]]) -> None:
+        slot_masks = {
+            slot.id: slot_code_masks(slot.slot_code)
+            for slots in self.slot_map.values() for slot in slots
+        }
+        # Slot lists by course position, looked up once instead of per node
+        course_slots = [self.slot_map.get(course.id, []) for course in self.courses]
+        num_courses = len(course_slots)
+        
+        def backtrack(index: int, selected: List[Slot], occupied_time: int,
+                      occupied_a: int, occupied_b: int) -> None:
             nonlocal all_solutions
             
             # Safety limit
             if len(all_solutions) >= max_solutions:
                 return
             
-            if index == len(self.courses):
+            if index == num_courses:
                 # Found a complete solution - use slot IDs as signature to avoid duplicates
-                sig = frozenset(s.id for s in selected)
+                # (courses are always filled in the same order, so no sorting needed)
+                sig = tuple(s.id for s in selected)
                 if sig not in seen_signatures:
                     seen_signatures.add(sig)
                     all_solutions.append(selected[:])  # Copy the list
                 return
             
-            course = self.courses[index]
-            available_slots = self.slot_map.get(course.id, [])
-            
-            for slot in available_slots:
+            for slot in course_slots[index]:
                 if len(all_solutions) >= max_solutions:
                     return
                 
-                # Check clashes with previously selected slots
-                clashes = False
-                for existing in selected:
-                    if self._check_clash_fast(slot.id, existing.id):
-                        clashes = True
-                        break
+                # Time overlap or mutual exclusion with the selected slots
+                slot_time, slot_a, slot_b = slot_masks[slot.id]
+                if (slot_time & occupied_time) or (slot_a & occupied_b) or (slot_b & occupied_a):
+                    continue
                 
-                if not clashes:
-                    # Check time slot availability
-                    slot_timings = self._get_slot_timings(slot)
-                    if not (slot_timings & occupied):
-                        # No clash - proceed
-                        occupied.update(slot_timings)
-                        selected.append(slot)
-                        
-                        backtrack(index + 1, selected, occupied)
-                        
-                        selected.pop()
-                        occupied.difference_update(slot_timings)
+                selected.append(slot)
+                backtrack(index + 1, selected, occupied_time | slot_time,
+                          occupied_a | slot_a, occupied_b | slot_b)
+                selected.pop()
         
         # Run exhaustive backtracking
-        backtrack(0, [], set())
+        backtrack(0, [], 0, 0, 0)
+        
+        # Score all solutions, then build details only for the top target_size
+        # (highest first; ties keep enumeration order)
+        scores = [self._calculate_solution_total_score(slots) for slots in all_solutions]
+        top_indices = heapq.nlargest(target_size, range(len(scores)), key=scores.__getitem__)
         
-        # Score and rank all solutions
         scored_solutions = []
-        for slots in all_solutions:
-            score = self._calculate_solution_total_score(slots)
+        for i in top_indices:
+            slots = all_solutions[i]
             total_credits = sum(s.course.c if s.course else 0 for s in slots)
             details = self._build_solution_details(slots)
             details['method'] = 'exhaustive'
@@ -1174,15 +1501,12 @@ class TimetableGenerator:
             
             scored_solutions.append(TimetableSolution(
                 slots=slots,
-                score=score,
+                score=scores[i],
                 total_credits=total_credits,
                 details=details
             ))
         
-        # Sort by score (highest first)
-        scored_solutions.sort(key=lambda x: x.score, reverse=True)
-        
-        return scored_solutions[:target_size]
+        return scored_solutions
 
 
     def _calculate_solution_total_score(self, slots: List[Slot]) -> float:
@@ -1209,10 +1533,11 @@ class TimetableGenerator:
         # 1. Group available slots by slot_code for each course
         # course_id -> list of unique slot_codes that are valid (filtered)
         course_slot_codes = {}
+        slots_by_course = self._load_slots_by_course()
         
         for course in self.courses:
             valid_codes = set()
-            for slot in course.slots.all():
+            for slot in slots_by_course.get(course.id, []):
                 if not self._should_exclude_slot(slot):
                     valid_codes.add(slot.slot_code)
             
@@ -1221,80 +1546,18 @@ class TimetableGenerator:
                 
             course_slot_codes[course.id] = list(valid_codes)
             
-        course_ids = [c.id for c in self.courses]
-        count = 0
-        
-        # 2. Backtrack on slot codes
-        def backtrack(index: int, occupied: Set[Tuple[str, int]]) -> None:
-            nonlocal count
-            
-            if count >= max_count:
-                return
-            
-            if index == len(course_ids):
-                count += 1
-                return
-            
-            course_id = course_ids[index]
-            available_codes = course_slot_codes.get(course_id, [])
-            
-            for code in available_codes:
-                if count >= max_count:
-                    return
-                
-                # Check clashes
-                clashes = False
-                
-                # Parse code into individual slots tokens/timings
-                # We don't have a Slot object here, just the code string
-                # So we must manually parse timings
-                code_parts = code.replace('/', '+').split('+')
-                new_occupied = set()
-                
-                for part in code_parts:
-                    timing = get_slot_timing(part)
-                    if timing:
-                        key = (timing['day'], timing['period'])
-                        if key in occupied:
-                            clashes = True
-                            break
-                        new_occupied.add(key)
-                        
-                    # Also check Mutual Exclusion Groups statically based on code string
-                    # (This assumes mutual exclusion rules are simple code checks)
-                    # For safety, we should ideally check against actual slot objects or logic,
-                    # but checking time overlap covers the main hard constraint.
-                
-                # Check MUTUAL_EXCLUSION_GROUPS
-                if not clashes:
-                    code_slots_set = set(code_parts)
-                    for group_a, group_b in MUTUAL_EXCLUSION_GROUPS:
-                        # Check against current code
-                        has_current_in_a = not code_slots_set.isdisjoint(group_a)
-                        has_current_in_b = not code_slots_set.isdisjoint(group_b)
-                        
-                        # We don't have a "selected" list of slot objects here to check against easily
-                        # But wait - we only need to check against occupied times?
-                        # No, mutual exclusion is about slot codes (e.g. C1 vs A2).
-                        # We need to track selected slot codes to check this properly.
-                        # However, since C1 and A2 generally overlap in time (or are defined to clash),
-                        # checking strict time overlap might be sufficient IF the timing map is accurate.
-                        # But let's be safe: we can check if occupied set implies any exclusion.
-                        pass # Skipping complex mutual exclusion for pure count if time covers it.
-                             # Actually time overlap usually covers it. 
-                             # C11 is Mon-3, C12 is Wed-3, C13 is Fri-3
-                             # A21 is Mon-4, A22 is Wed-4... wait, they might conflict in exam slots?
-                             # In FFCS, typically they don't time-clash but are grouped clashes.
-                             # Let's trust pure time clash for now as "good enough" approximation 
-                             # or if critical, we'd need to pass 'selected_codes' down.
-                
-                if not clashes:
-                    occupied.update(new_occupied)
-                    backtrack(index + 1, occupied)
-                    occupied.difference_update(new_occupied)
-        
-        backtrack(0, set())
-        return count
+        # 2. Count clash-free code combinations on bitmasks.
+        # Only time overlap is checked here (mutual exclusion groups are not
+        # applied to the distinct count), so the group bits are left out.
+        domains = []
+        for codes in course_slot_codes.values():
+            domain = {}
+            for code in codes:
+                key = (slot_code_masks(code)[0], 0, 0)
+                domain[key] = domain.get(key, 0) + 1
+            domains.append(domain)
+        
+        return count_mask_combinations(domains, max_count)
 
     def count_solutions(self, max_count: int = 100000) -> int:
         """
@@ -1303,57 +1566,58 @@ class TimetableGenerator:
         """
         if not self.courses:
             return 0
-            
-        count = 0
-        def backtrack(index: int, selected: List[Slot], occupied: Set[Tuple[str, int]]) -> None:
-            nonlocal count
-            if count >= max_count:
-                return
-            
-            if index == len(self.courses):
-                count += 1
-                return
-            
-            course_id = self.courses[index].id
-            # Use pre-built slot map which is already filtered
-            available_slots = self.slot_map.get(course_id, [])
-            
-            for slot in available_slots:
-                if count >= max_count:
-                    return
-                
-                # Check clashes with previously selected slots
-                clashes = False
-                for existing in selected:
-                    if self._check_clash(slot, existing):
-                        clashes = True
-                        break
-                
-                if not clashes:
-                    # Check time slot availability against occupied set
-                    new_occupied = set()
-                    for s in slot.get_individual_slots():
-                        timing = get_slot_timing(s)
-                        if timing:
-                            key = (timing['day'], timing['period'])
-                            if key in occupied:
-                                clashes = True
-                                break
-                            new_occupied.add(key)
-                    
-                    if not clashes:
-                        selected.append(slot)
-                        occupied.update(new_occupied)
-                        
-                        backtrack(index + 1, selected, occupied)
-                        
-                        selected.pop()
-                        occupied.difference_update(new_occupied)
         
-        backtrack(0, [], set())
-        return count
+        # Cheap bounds before any traversal: the product of domain sizes is an
+        # upper bound, and it's exact when no candidate slot clashes with another.
+        domains = [self.slot_map.get(course.id, []) for course in self.courses]
+        upper_bound = math.prod(len(slots) for slots in domains)
+        if upper_bound == 0:
+            return 0
+        
+        # Slots sharing a slot code (different faculty) collapse into one branch
+        mask_domains = []
+        unions = []
+        for slots in domains:
+            domain = {}
+            union_time = union_a = union_b = 0
+            for slot in slots:
+                key = slot_code_masks(slot.slot_code)
+                domain[key] = domain.get(key, 0) + 1
+                union_time |= key[0]
+                union_a |= key[1]
+                union_b |= key[2]
+            mask_domains.append(domain)
+            unions.append((union_time, union_a, union_b))
+        
+        # No two courses' slots can clash iff no two courses' mask unions meet
+        if not any(
+            (t1 & t2) or (a1 & b2) or (b1 & a2)
+            for i, (t1, a1, b1) in enumerate(unions)
+            for t2, a2, b2 in unions[i + 1:]
+        ):
+            return min(upper_bound, max_count)
+        
+        # Bitmask backtracking
+        return count_mask_combinations(mask_domains, max_count)
 
+    def _preference_rank(self, slot: Slot) -> Optional[int]:
+        """0-based rank of the slot's teacher in its course's preference list, or None."""
+        if not slot.faculty:
+            return None
+        return self._faculty_rank.get((slot.course_id, slot.faculty.name))
+    
     def _score_slot(self, slot: Slot) -> float:
+        """
+        Score of a single slot, memoized by slot id. The score depends only on the
+        slot and the (frozen) preferences, while the map sort and every solution
+        score ask for it again.
+        """
+        score = self._slot_scores_cache.get(slot.id)
+        if score is None:
+            score = self._slot_scores_cache[slot.id] = self._compute_slot_score(slot)
+        return score
+    
+    def _compute_slot_score(self, slot: Slot) -> float:
         """
         Calculate score for a single slot based on detailed user rules.
         Score is calculated PER INDIVIDUAL TIME UNIT (e.g. A11, A12) then averaged?
@@ -1369,82 +1633,25 @@ class TimetableGenerator:
         
         # 1. Faculty Score
         # "Teacher with priority 1 on course A gets a 100 score, priority 2 gets 80"
+        # Boosted scores to make Faculty Preference DOMINANT over Time Preference (max 100).
+        # Unlisted teachers get no faculty score.
         faculty_score = 0.0
-        if self.preferences.course_faculty_preferences and slot.course_id:
-            # Cast to string because JSON keys are strings
-            cid_str = str(slot.course_id)
-            course_prefs = self.preferences.course_faculty_preferences.get(cid_str, [])
-            
-            if slot.faculty and slot.faculty.name in course_prefs:
-                rank = course_prefs.index(slot.faculty.name)
-                # Boosted scores to make Faculty Preference DOMINANT over Time Preference (max 100)
-                if rank == 0:
-                    faculty_score = 1000.0
-                elif rank == 1:
-                    faculty_score = 800.0
-                elif rank == 2:
-                    faculty_score = 600.0
-            else:
-                # Unlisted teacher getting low priority? 
-                # User didn't specify, but implies only prioritized ones get score.
-                # Let's give small base score or 0.
-                pass
+        rank = self._preference_rank(slot)
+        if rank is not None and rank < len(FACULTY_RANK_SCORES):
+            faculty_score = float(FACULTY_RANK_SCORES[rank])
         
         # 2. Time Score (Per Cell)
-        # Calculate for each cell and take average for this slot group
+        # Calculate for each cell and take average for this slot group.
+        # Cell scores only depend on the preferences, so they come from a table
+        # built once per generator; an avoided teacher penalizes every cell.
+        cell_time_scores = self._cell_time_scores
+        avoided = bool(slot.faculty and slot.faculty.name in self.preferences.avoided_faculties)
         
-        mode = self.preferences.time_mode
-        # Compat check
-        if mode == 'none':
-            if self.preferences.prefer_morning: mode = 'morning'
-            elif self.preferences.prefer_afternoon: mode = 'afternoon' # "evening"
-            
         for s in individual_slots:
-            cell_time_score = 0.0
-            
-            # Check exclusions first
-            if s in self.preferences.exclude_slots:
-                 cell_time_score -= 1000.0
-            elif slot.faculty and slot.faculty.name in self.preferences.avoided_faculties:
-                 cell_time_score -= 1000.0
+            if avoided:
+                cell_time_score = -1000.0
             else:
-                timing = get_slot_timing(s)
-                if timing:
-                    period = timing['period']
-                    
-                    # Check Soft Avoidance Filters (User said "least scores", so we give 0)
-                    if self.preferences.avoid_early_morning and period == 1:
-                        cell_time_score = 0.0
-                    elif self.preferences.avoid_late_evening and period == 7:
-                         cell_time_score = 0.0
-                    else:
-                        # Normal Mode Scoring (Normalized to 0-100 to match Faculty Weight)
-                        if mode == 'morning':
-                            # P1(8:30) -> 100. P7(18:00) -> 10.
-                            # Slope: -15 per period roughly.
-                            # P1: 100. P2: 85. P3: 70... P7: 10.
-                            cell_time_score = max(0, 115 - (15 * period))
-                            
-                        elif mode == 'evening' or mode == 'afternoon':
-                            # P7 -> 100. P1 -> 10.
-                            # P7: 100. P6: 85...
-                            # 10 + (15 * (period-1)) ?
-                            # P1: 10. P7: 10 + 90 = 100.
-                            cell_time_score = max(0, 10 + (15 * (period - 1)))
-                            
-                        elif mode == 'middle':
-                            # Peak P4 -> 100.
-                            # P3/P5 -> 70.
-                            # P2/P6 -> 40.
-                            # P1/P7 -> 10.
-                            dist = abs(period - 4) 
-                            # 100 - (30 * dist)
-                            cell_time_score = max(0, 100 - (30 * dist))
-                        
-                        else:
-                            # Random or None mode -> Neutral score
-                            # If only Teachers applied, this acts as base.
-                            cell_time_score = 50.0
+                cell_time_score = cell_time_scores.get(s, 0.0)
             
             # Combine scores
             # User said "calculate the average score of selected cells"
@@ -1468,6 +1675,46 @@ class TimetableGenerator:
             
         return avg_score * credits
     
+    def _build_cell_time_scores(self) -> Dict[str, float]:
+        """
+        Time score of every individual slot code (e.g. 'A11') under the current
+        preferences. Codes missing from the table score 0.
+        """
+        mode = self.preferences.time_mode
+        # Compat check
+        if mode == 'none':
+            if self.preferences.prefer_morning: mode = 'morning'
+            elif self.preferences.prefer_afternoon: mode = 'afternoon' # "evening"
+        
+        scores: Dict[str, float] = {}
+        for code, timing in SLOT_TIMINGS.items():
+            period = timing['period']
+            
+            # Check Soft Avoidance Filters (User said "least scores", so we give 0)
+            if self.preferences.avoid_early_morning and period == 1:
+                scores[code] = 0.0
+            elif self.preferences.avoid_late_evening and period == 7:
+                scores[code] = 0.0
+            # Normal Mode Scoring (Normalized to 0-100 to match Faculty Weight)
+            elif mode == 'morning':
+                # P1(8:30) -> 100, P2 -> 85 ... P7(18:00) -> 10
+                scores[code] = max(0, 115 - (15 * period))
+            elif mode == 'evening' or mode == 'afternoon':
+                # P1 -> 10 ... P7 -> 100
+                scores[code] = max(0, 10 + (15 * (period - 1)))
+            elif mode == 'middle':
+                # Peak P4 -> 100, P3/P5 -> 70, P2/P6 -> 40, P1/P7 -> 10
+                scores[code] = max(0, 100 - (30 * abs(period - 4)))
+            else:
+                # Random or None mode -> Neutral score
+                # If only Teachers applied, this acts as base.
+                scores[code] = 50.0
+        
+        # Excluded cells are heavily penalized, timed or not
+        for code in self._exclude_set:
+            scores[code] = -1000.0
+        return scores
+    
     def _estimate_gap_penalty(self, slot: Slot) -> float:
         """
         Estimate gap penalty based on slot's position.
@@ -1499,29 +1746,7 @@ class TimetableGenerator:
     
     def _check_clash(self, slot1: Slot, slot2: Slot) -> bool:
         """Check if two slots clash (time overlap or mutual exclusion)."""
-        slots1 = set(slot1.get_individual_slots())
-        slots2 = set(slot2.get_individual_slots())
-        
-        # Check mutual exclusion groups
-        for group_a, group_b in MUTUAL_EXCLUSION_GROUPS:
-            has_1_in_a = not slots1.isdisjoint(group_a)
-            has_1_in_b = not slots1.isdisjoint(group_b)
-            has_2_in_a = not slots2.isdisjoint(group_a)
-            has_2_in_b = not slots2.isdisjoint(group_b)
-            
-            if (has_1_in_a and has_2_in_b) or (has_1_in_b and has_2_in_a):
-                return True
-        
-        # Check time overlap
-        for s1 in slots1:
-            for s2 in slots2:
-                t1 = get_slot_timing(s1)
-                t2 = get_slot_timing(s2)
-                if t1 and t2:
-                    if t1['day'] == t2['day'] and t1['period'] == t2['period']:
-                        return True
-        
-        return False
+        return slot_codes_conflict(slot1.slot_code, slot2.slot_code)
     
     def _calculate_solution_score(self, slots: List[Slot]) -> Tuple[float, Dict]:
         """Calculate overall score for a complete solution."""
@@ -1538,36 +1763,11 @@ class TimetableGenerator:
             
             # Count preferred faculty matches
             # Count preferred faculty matches
-            if slot.faculty and slot.course_id:
-                cid_str = str(slot.course_id)
-                if cid_str in self.preferences.course_faculty_preferences:
-                    if slot.faculty.name in self.preferences.course_faculty_preferences[cid_str]:
-                        details['preferred_faculty_matches'] += 1
+            if self._preference_rank(slot) is not None:
+                details['preferred_faculty_matches'] += 1
         
         # Calculate gaps per day
-        day_periods: Dict[str, List[int]] = {}
-        for slot in slots:
-            for s in slot.get_individual_slots():
-                timing = get_slot_timing(s)
-                if timing:
-                    day = timing['day']
-                    if day not in day_periods:
-                        day_periods[day] = []
-                    day_periods[day].append(timing['period'])
-                    
-                    if day == 'SAT':
-                        details['saturday_classes'] += 1
-        
-        total_gaps = 0
-        for day, periods in day_periods.items():
-            periods.sort()
-            gaps = 0
-            for i in range(1, len(periods)):
-                gap = periods[i] - periods[i-1] - 1
-                if gap > 0:
-                    gaps += gap
-            details['gaps_per_day'][day] = gaps
-            total_gaps += gaps
+        total_gaps = self._fill_day_gaps(slots, details)
         
         # Penalize gaps
         score -= total_gaps * 2
@@ -1577,13 +1777,15 @@ class TimetableGenerator:
         
         return score, details
     
-    def generate(self, limit: int = 5, offset: int = 0) -> Generator[TimetableSolution, None, None]:
+    def generate(self, limit: int = 5, offset: int = 0,
+                 exclude: Optional[Set[frozenset]] = None) -> Generator[TimetableSolution, None, None]:
         """
         Generate valid timetable solutions using backtracking.
         
         Args:
             limit: Maximum number of solutions to return
             offset: Number of solutions to skip (for pagination)
+            exclude: Slot-id sets of solutions already returned; skipped without counting toward offset
             
         Yields:
             TimetableSolution objects
@@ -1591,9 +1793,11 @@ class TimetableGenerator:
         if not self.courses:
             return
         
-        # Randomize course order for diversity
+        # Randomize course order for diversity, then put the most constrained
+        # courses first (fail-first): the sort is stable, so ties stay shuffled
         course_ids = [c.id for c in self.courses]
         random.shuffle(course_ids)
+        course_ids.sort(key=lambda course_id: len(self.slot_map.get(course_id, [])))
         
         # Also re-shuffle slots for each course to get different combinations
         for course_id in course_ids:
@@ -1602,95 +1806,110 @@ class TimetableGenerator:
         
         solutions_found = 0
         solutions_skipped = 0
-        seen_solutions: Set[frozenset] = set()  # Track unique combinations
+        seen_solutions: Set[frozenset] = set(exclude or ())  # Track unique combinations
         
-        def backtrack(index: int, selected: List[Slot], occupied: Set[Tuple[str, int]]) -> Generator:
-            """Recursive backtracking with pruning."""
-            nonlocal solutions_found, solutions_skipped
+        # Per-slot (time, group A, group B) masks: a clash test is a few ANDs against
+        # the running occupancy instead of pairwise checks against every selected slot
+        slot_masks = {
+            slot.id: slot_code_masks(slot.slot_code)
+            for course_id in course_ids for slot in self.slot_map.get(course_id, [])
+        }
+        
+        if limit <= 0:
+            return
+        
+        # Iterative backtracking with pruning: one stack frame per course being
+        # placed, holding the iterator over its remaining slots and the occupancy
+        # masks of the slots selected before it. selected[i] is the slot currently
+        # chosen for course_ids[i].
+        course_slots = [self.slot_map.get(course_id, []) for course_id in course_ids]
+        num_courses = len(course_ids)
+        selected: List[Slot] = []
+        stack = [(iter(course_slots[0]), 0, 0, 0)]
+        
+        while stack:
+            slots_iter, occupied_time, occupied_a, occupied_b = stack[-1]
             
-            if solutions_found >= limit:
-                return
+            # Next slot for this course that doesn't clash with any already selected
+            # (time or mutual exclusion)
+            for slot in slots_iter:
+                time_mask, a_bits, b_bits = slot_masks[slot.id]
+                if not ((time_mask & occupied_time) or (a_bits & occupied_b) or (b_bits & occupied_a)):
+                    break
+            else:
+                # Course exhausted: backtrack to the previous course's next slot
+                stack.pop()
+                if selected:
+                    selected.pop()
+                continue
             
-            if index == len(course_ids):
-                # Create a signature for this solution (set of slot IDs)
-                solution_sig = frozenset(s.id for s in selected)
-                
-                # Skip duplicates
-                if solution_sig in seen_solutions:
-                    return
+            selected.append(slot)
+            
+            if len(selected) < num_courses:
+                stack.append((
+                    iter(course_slots[len(selected)]),
+                    occupied_time | time_mask, occupied_a | a_bits, occupied_b | b_bits
+                ))
+                continue
+            
+            # Complete selection: create a signature for it (set of slot IDs)
+            solution_sig = frozenset(s.id for s in selected)
+            
+            # Skip duplicates, then the first `offset` unique solutions
+            if solution_sig not in seen_solutions:
                 seen_solutions.add(solution_sig)
-                
-                # Found a complete, unique solution
                 if solutions_skipped < offset:
                     solutions_skipped += 1
-                    return
-                
-                total_credits = sum(s.course.c for s in selected if s.course)
-                score, details = self._calculate_solution_score(selected)
-                
-                solutions_found += 1
-                yield TimetableSolution(
-                    slots=list(selected),
-                    score=score,
-                    total_credits=total_credits,
-                    details=details
-                )
-                return
-            
-            course_id = course_ids[index]
-            available_slots = self.slot_map.get(course_id, [])
+                else:
+                    # Found a complete, unique solution
+                    solutions_found += 1
+                    yield self._make_solution(list(selected))
+                    if solutions_found >= limit:
+                        return
             
-            for slot in available_slots:
-                # Check if this slot clashes with any already selected
-                clashes = False
-                for existing in selected:
-                    if self._check_clash(slot, existing):
-                        clashes = True
-                        break
-                
-                if not clashes:
-                    # Check time slot availability
-                    new_occupied = set()
-                    for s in slot.get_individual_slots():
-                        timing = get_slot_timing(s)
-                        if timing:
-                            key = (timing['day'], timing['period'])
-                            if key in occupied:
-                                clashes = True
-                                break
-                            new_occupied.add(key)
-                    
-                    if not clashes:
-                        # Recurse with this slot selected
-                        selected.append(slot)
-                        occupied.update(new_occupied)
-                        
-                        yield from backtrack(index + 1, selected, occupied)
-                        
-                        # Backtrack
-                        selected.pop()
-                        occupied.difference_update(new_occupied)
-                        
-                        if solutions_found >= limit:
-                            return
-        
-        yield from backtrack(0, [], set())
+            selected.pop()
     
-    def generate_batch(self, limit: int = 5, offset: int = 0) -> List[TimetableSolution]:
+    def generate_batch(self, limit: int = 5, offset: int = 0,
+                       exclude: Optional[Set[frozenset]] = None) -> List[TimetableSolution]:
         """
         Generate a batch of solutions (non-generator version).
         
         Args:
             limit: Maximum number of solutions
             offset: Pagination offset
+            exclude: Slot-id sets of solutions to skip (see generate)
             
         Returns:
             List of TimetableSolution objects, sorted by score descending
         """
-        solutions = list(self.generate(limit=limit, offset=offset))
+        solutions = list(self.generate(limit=limit, offset=offset, exclude=exclude))
         solutions.sort(key=lambda s: s.score, reverse=True)
         return solutions
     
+    def _make_solution(self, slots: List[Slot]) -> TimetableSolution:
+        """Score a complete selection of slots and wrap it as a solution."""
+        total_credits = sum(s.course.c for s in slots if s.course)
+        score, details = self._calculate_solution_score(slots)
+        return TimetableSolution(
+            slots=slots,
+            score=score,
+            total_credits=total_credits,
+            details=details
+        )
+    
+    def solutions_from_slot_ids(self, slot_id_lists: List[Tuple[int, ...]]) -> List[TimetableSolution]:
+        """
+        Rebuild previously generated solutions from their slot ids, using the slots
+        already loaded into slot_map. Every id must be among the loaded slots.
+        """
+        slots_by_id = {slot.id: slot for slots in self.slot_map.values() for slot in slots}
+        solutions = []
+        for slot_ids in slot_id_lists:
+            assert all(slot_id in slots_by_id for slot_id in slot_ids), \
+                f"slot ids {slot_ids} are not all loaded"
+            solutions.append(self._make_solution([slots_by_id[slot_id] for slot_id in slot_ids]))
+        return solutions
+    
     def _get_timetable_signature(self, slots: List[Slot]) -> Tuple:
         """
         Create a signature for a timetable based on time distribution.
@@ -1702,15 +1921,11 @@ class TimetableGenerator:
         periods_used = set()
         
         for slot in slots:
-            for code in slot.get_individual_slots():
-                timing = get_slot_timing(code)
-                if timing:
-                    days_used.add(timing['day'])
-                    periods_used.add(timing['period'])
-                    if timing['period'] <= 3:
-                        morning_count += 1
-                    else:
-                        afternoon_count += 1
+            days, periods, morning, afternoon = slot_code_distribution(slot.slot_code)
+            days_used |= days
+            periods_used |= periods
+            morning_count += morning
+            afternoon_count += afternoon
         
         return (
             frozenset(days_used),
@@ -1719,22 +1934,36 @@ class TimetableGenerator:
             afternoon_count
         )
 
-    def _calculate_diversity_score(self, new_slots: List[Slot], existing_solutions: List[TimetableSolution]) -> float:
+    def _calculate_diversity_score(self, new_slots: List[Slot], existing_solutions: List[TimetableSolution],
+                                   new_key: Optional[Tuple[Tuple, frozenset]] = None,
+                                   threshold: Optional[float] = None) -> float:
         """
         Calculate how different a new solution is from all existing solutions.
         Higher score = more different = better for diversity.
+        new_key: the new solution's (signature, slot-id set), if the caller has it.
+        threshold: stop comparing once the score is known to reach it; the
+            returned score is then at least threshold but may understate it.
         """
         if not existing_solutions:
             return 100.0
         
-        new_sig = self._get_timetable_signature(new_slots)
-        new_slot_ids = frozenset(s.id for s in new_slots)
+        if new_key is None:
+            new_key = (self._get_timetable_signature(new_slots), frozenset(s.id for s in new_slots))
+        new_sig, new_slot_ids = new_key
         
         min_diff = float('inf')
+        # The score only grows as min_diff falls, so reaching this similarity settles it
+        settled_similarity = (100 - threshold) / 5 if threshold is not None else -1
         
         for existing in existing_solutions:
-            existing_sig = self._get_timetable_signature(existing.slots)
-            existing_ids = frozenset(s.id for s in existing.slots)
+            # Accepted solutions are compared against every later candidate, so
+            # their signature and id set are built once and kept on the solution
+            if existing.diversity_key is None:
+                existing.diversity_key = (
+                    self._get_timetable_signature(existing.slots),
+                    frozenset(s.id for s in existing.slots)
+                )
+            existing_sig, existing_ids = existing.diversity_key
             
             # Count shared slots (lower = more different)
             shared_slots = len(new_slot_ids & existing_ids)
@@ -1749,6 +1978,8 @@ class TimetableGenerator:
             similarity = shared_slots * 10 + shared_days * 2 + shared_periods
             
             min_diff = min(min_diff, similarity)
+            if min_diff <= settled_similarity:
+                break
         
         # Convert to diversity score (higher = better)
         return max(0, 100 - min_diff * 5)
@@ -1768,6 +1999,10 @@ class TimetableGenerator:
         if not self.courses:
             return []
         
+        # A course with no usable slot leaves nothing to search
+        if any(not self.slot_map.get(course.id) for course in self.courses):
+            return []
+        
         solutions = []
         seen_ids: Set[frozenset] = set()
         
@@ -1780,55 +2015,29 @@ class TimetableGenerator:
         max_attempts = limit * 50
         attempts = 0
         
+        # Per-call copies of the slot lists: restarts reshuffle these, leaving
+        # self.slot_map in score order for other searches on this generator
+        domains = {course.id: list(self.slot_map[course.id]) for course in self.courses}
+        
+        # Dead ends learned across restarts (nogoods, see find_mask_timetable).
+        # Slot order changes between restarts but the domains don't, so a nogood
+        # found on one restart holds for all. Each slot gets a distinct bit.
+        slot_entries = {
+            slot.id: (1 << i,) + slot_code_masks(slot.slot_code)
+            for i, slot in enumerate(chain.from_iterable(domains.values()))
+        }
+        slots_by_bit = {slot_entries[slot.id][0]: slot for slots in domains.values() for slot in slots}
+        nogoods: Dict[int, List[int]] = {}
+        
         def try_generate():
             nonlocal attempts
-            
-            def backtrack(index: int, selected: List[Slot], occupied: Set[Tuple[str, int]]) -> Optional[List[Slot]]:
-                nonlocal attempts
-                if attempts >= max_attempts:
-                    return None
-                    
-                if index == len(self.courses):
-                    return selected[:]
-                
-                course_id = course_ids[index]
-                # Slots are already sorted by score (preference) in _build_slot_map
-                slots = self.slot_map.get(course_id, [])
-                
-                for slot in slots:
-                    attempts += 1
-                    if attempts >= max_attempts:
-                        return None
-                        
-                    # Check clashes
-                    clashes = False
-                    for existing in selected:
-                        if self._check_clash(slot, existing):
-                            clashes = True
-                            break
-                    
-                    if not clashes:
-                        # Check time availability
-                        new_occupied = set()
-                        time_clash = False
-                        for s in slot.get_individual_slots():
-                            timing = get_slot_timing(s)
-                            if timing:
-                                key = (timing['day'], timing['period'])
-                                if key in occupied:
-                                    time_clash = True
-                                    break
-                                new_occupied.add(key)
-                        
-                        if not time_clash:
-                            occupied.update(new_occupied)
-                            result = backtrack(index + 1, selected + [slot], occupied)
-                            occupied.difference_update(new_occupied)
-                            if result:
-                                return result
-                return None
-            
-            return backtrack(0, [], set())
+            # Slots are already sorted by score (preference) in _build_slot_map
+            picked, tried = find_mask_timetable(
+                [[slot_entries[slot.id] for slot in domains[course_id]] for course_id in course_ids],
+                nogoods, max_attempts - attempts
+            )
+            attempts += tried
+            return [slots_by_bit[bit] for bit in picked] if picked else None
         
         # Try to find diverse solutions with decreasing strictness
         current_min_diversity = min_diversity
@@ -1836,16 +2045,25 @@ class TimetableGenerator:
         
         # Initial course order
         course_ids = [c.id for c in self.courses]
+        # How many accepted solutions use each slot id
+        slot_uses: Dict[int, int] = {}
         
         while len(solutions) < limit and attempts < max_attempts:
-            # Always shuffle COURSE order for variety in backtracking path
+            # Always shuffle COURSE order for variety in backtracking path, then put
+            # the most constrained courses first (fail-first): the sort is stable,
+            # so only courses with equally sized domains trade places between runs
             random.shuffle(course_ids)
+            course_ids.sort(key=lambda course_id: len(domains[course_id]))
             
-            # ONLY shuffle slots if NO preference is set
+            # ONLY shuffle slots if NO preference is set. Slots already used by
+            # accepted solutions then go last (the sort is stable, so the rest stay
+            # shuffled), steering each restart toward unseen slots instead of
+            # rebuilding near-duplicates that the diversity check rejects
             if should_shuffle_slots:
                 for cid in course_ids:
-                    if cid in self.slot_map:
-                        random.shuffle(self.slot_map[cid])
+                    random.shuffle(domains[cid])
+                    if slot_uses:
+                        domains[cid].sort(key=lambda slot: slot_uses.get(slot.id, 0))
             
             result = try_generate()
             
@@ -1857,24 +2075,23 @@ class TimetableGenerator:
                     attempts += 1  # Count duplicate as attempt to avoid infinite loops
                     continue
                 
-                # Check diversity
-                diversity = self._calculate_diversity_score(result, solutions)
-                
                 # If we're stuck, lower the bar
                 if failed_attempts_streak > 20:
                     current_min_diversity = max(5.0, current_min_diversity - 5.0)
                     failed_attempts_streak = 0
                 
+                # Check diversity; the candidate's key is kept on it if accepted
+                diversity_key = (self._get_timetable_signature(result), slot_ids)
+                diversity = self._calculate_diversity_score(result, solutions, diversity_key,
+                                                            threshold=current_min_diversity)
+                
                 if diversity >= current_min_diversity or len(solutions) == 0:
                     seen_ids.add(slot_ids)
-                    total_credits = sum(s.course.c for s in result if s.course)
-                    score, details = self._calculate_solution_score(result)
-                    solutions.append(TimetableSolution(
-                        slots=result,
-                        score=score,
-                        total_credits=total_credits,
-                        details=details
-                    ))
+                    solution = self._make_solution(result)
+                    solution.diversity_key = diversity_key
+                    solutions.append(solution)
+                    for slot_id in slot_ids:
+                        slot_uses[slot_id] = slot_uses.get(slot_id, 0) + 1
                     failed_attempts_streak = 0
                 else:
                     failed_attempts_streak += 1
@@ -1917,23 +2134,22 @@ class TimetableGenerator:
             if len(solutions) >= limit:
                 break
             
-            for vary_indices in self._combinations(range(len(course_ids)), vary_count):
+            for vary_indices in combinations(range(len(course_ids)), vary_count):
                 if len(solutions) >= limit:
                     break
                 
                 # Start with reference slots
                 selected = []
-                occupied = set()
-                valid = True
+                occupied_time = occupied_a = occupied_b = 0
                 
                 for i, cid in enumerate(course_ids):
                     if i not in vary_indices and cid in reference_slots:
                         slot = reference_slots[cid]
                         selected.append(slot)
-                        for s in slot.get_individual_slots():
-                            timing = get_slot_timing(s)
-                            if timing:
-                                occupied.add((timing['day'], timing['period']))
+                        slot_time, slot_a, slot_b = slot_code_masks(slot.slot_code)
+                        occupied_time |= slot_time
+                        occupied_a |= slot_a
+                        occupied_b |= slot_b
                 
                 # Try different slots for varied courses
                 for idx in vary_indices:
@@ -1944,56 +2160,29 @@ class TimetableGenerator:
                         if cid in reference_slots and slot.id == reference_slots[cid].id:
                             continue  # Skip reference slot
                         
-                        clashes = False
-                        for existing in selected:
-                            if self._check_clash(slot, existing):
-                                clashes = True
-                                break
+                        # Time overlap or mutual exclusion with the kept reference slots
+                        slot_time, slot_a, slot_b = slot_code_masks(slot.slot_code)
+                        if (slot_time & occupied_time) or (slot_a & occupied_b) or (slot_b & occupied_a):
+                            continue
+                        
+                        # Only a selection covering every course can be accepted; check
+                        # that before building the candidate list and its id set
+                        if len(selected) + 1 != len(course_ids):
+                            continue
+                        
+                        test_selected = selected + [slot]
+                        slot_ids = frozenset(s.id for s in test_selected)
                         
-                        if not clashes:
-                            new_occupied = set()
-                            for s in slot.get_individual_slots():
-                                timing = get_slot_timing(s)
-                                if timing:
-                                    key = (timing['day'], timing['period'])
-                                    if key in occupied:
-                                        clashes = True
-                                        break
-                                    new_occupied.add(key)
-                            
-                            if not clashes:
-                                test_selected = selected + [slot]
-                                slot_ids = frozenset(s.id for s in test_selected)
-                                
-                                if slot_ids not in seen_ids and len(test_selected) == len(course_ids):
-                                    seen_ids.add(slot_ids)
-                                    total_credits = sum(s.course.c for s in test_selected if s.course)
-                                    score, details = self._calculate_solution_score(test_selected)
-                                    solutions.append(TimetableSolution(
-                                        slots=test_selected,
-                                        score=score,
-                                        total_credits=total_credits,
-                                        details=details
-                                    ))
-                                    break
+                        if slot_ids not in seen_ids:
+                            seen_ids.add(slot_ids)
+                            total_credits = sum(s.course.c for s in test_selected if s.course)
+                            score, details = self._calculate_solution_score(test_selected)
+                            solutions.append(TimetableSolution(
+                                slots=test_selected,
+                                score=score,
+                                total_credits=total_credits,
+                                details=details
+                            ))
+                            break
         
         return solutions[:limit]
-
-    def _combinations(self, items, r):
-        """Generate combinations of r items from list."""
-        items = list(items)
-        n = len(items)
-        if r > n:
-            return
-        indices = list(range(r))
-        yield tuple(items[i] for i in indices)
-        while True:
-            for i in reversed(range(r)):
-                if indices[i] != i + n - r:
-                    break
-            else:
-                return
-            indices[i] += 1
-            for j in range(i + 1, r):
-                indices[j] = indices[j - 1] + 1
-            yield tuple(items[i] for i in indices)